@@ -0,0 +1,233 @@
+from collections import OrderedDict, deque
+from time import monotonic
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, Request
+from app.config import settings
+import asyncio
+import math
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted before its queueing deadline"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; tokens go negative while reserved by queued requests"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, rate: float, burst: float, now: float):
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class AdmissionClass:
+    """
+    Admission control for one class of expensive endpoints.
+
+    Each client gets a token bucket, and the class as a whole runs at most
+    `max_concurrent` requests at once. A request over either limit waits until
+    its token or a free slot is due, as long as that is within `queue_timeout`
+    seconds; otherwise it is rejected straight away with a retry hint. Limits
+    apply per worker process.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrent: int,
+                 queue_timeout: float, max_queued: int, max_clients: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # Futures of requests waiting for a slot, first come first served
+        self.waiters: "deque[asyncio.Future]" = deque()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"rate": 0, "concurrency": 0, "queue_full": 0}
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.burst, now)
+            # Forget the least recently seen clients; a forgotten client starts with a full bucket
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+            bucket.refill(self.rate, self.burst, now)
+        return bucket
+
+    def _reject(self, reason: str, retry_after: float):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, retry_after)
+
+    async def acquire(self, client: str):
+        now = monotonic()
+        deadline = now + self.queue_timeout
+        bucket = self._bucket(client, now)
+
+        # Seconds until this request's token has refilled
+        wait = (1 - bucket.tokens) / self.rate if bucket.tokens < 1 else 0.0
+        if wait > self.queue_timeout:
+            self._reject("rate", wait)
+        if wait > 0 or self._full():
+            if self.queued >= self.max_queued:
+                self._reject("queue_full", max(wait, 1.0))
+
+        # Reserve the token now so later requests from the same client queue behind this one
+        bucket.tokens -= 1
+        self.queued += 1
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if self._full():
+                await self._wait_for_slot(deadline - monotonic())
+            else:
+                self.in_flight += 1
+        except AdmissionRejected:
+            bucket.tokens += 1
+            raise
+        except asyncio.CancelledError:
+            # The client went away while queued
+            bucket.tokens += 1
+            raise
+        finally:
+            self.queued -= 1
+        self.admitted += 1
+
+    def _full(self) -> bool:
+        return self.in_flight >= self.max_concurrent or bool(self.waiters)
+
+    async def _wait_for_slot(self, timeout: float):
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            self._reject("concurrency", self.queue_timeout)
+        except asyncio.CancelledError:
+            # A slot handed over just as the request was cancelled goes to the next waiter
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            try:
+                self.waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter so newcomers cannot jump the queue
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.snapshot(),
+            "max_concurrent": self.max_concurrent,
+            "rate_per_client": self.rate,
+            "burst_per_client": self.burst,
+            "clients": len(self.buckets)
+        }
+
+
+class Admission:
+    """The admission classes, one per kind of expensive endpoint"""
+
+    def __init__(self, enabled: bool, classes: Dict[str, AdmissionClass]):
+        self.enabled = enabled
+        self.classes = classes
+
+    def limit(self, name: str):
+        """FastAPI dependency holding an admission slot of the named class for the whole request"""
+        admission_class = self.classes[name]
+
+        async def dependency(request: Request):
+            if not self.enabled:
+                yield
+                return
+            try:
+                await admission_class.acquire(client_identity(request))
+            except AdmissionRejected as e:
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"Too many {name} requests, retry later",
+                    headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+                )
+            try:
+                yield
+            finally:
+                admission_class.release()
+
+        return dependency
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: admission_class.snapshot() for name, admission_class in self.classes.items()}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: admission_class.stats() for name, admission_class in self.classes.items()}
+
+
+def client_identity(request: Request) -> str:
+    """API key when the client sends one, otherwise the peer address"""
+    api_key: Optional[str] = request.headers.get("x-api-key")
+    if api_key:
+        return f"key:{api_key}"
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return f"auth:{authorization}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+admission = Admission(
+    enabled=settings.ADMISSION_ENABLED,
+    classes={
+        # LLM calls and template rendering
+        "generation": AdmissionClass(
+            "generation",
+            rate=settings.GENERATION_RATE_PER_CLIENT,
+            burst=settings.GENERATION_BURST_PER_CLIENT,
+            max_concurrent=settings.GENERATION_MAX_CONCURRENT,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+            max_queued=settings.ADMISSION_MAX_QUEUED,
+            max_clients=settings.ADMISSION_MAX_CLIENTS
+        ),
+        # kubectl applies and image builds
+        "deployment": AdmissionClass(
+            "deployment",
+            rate=settings.DEPLOYMENT_RATE_PER_CLIENT,
+            burst=settings.DEPLOYMENT_BURST_PER_CLIENT,
+            max_concurrent=settings.DEPLOYMENT_MAX_CONCURRENT,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+            max_queued=settings.ADMISSION_MAX_QUEUED,
+            max_clients=settings.ADMISSION_MAX_CLIENTS
+        ),
+    }
+)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict, List
 
 
 class Settings(BaseSettings):
@@ -9,7 +9,7 @@ class Settings(BaseSettings):
     VERSION: str = "1.0.0"
     
     # LLM Settings
-    GROQ_API_KEY: str
+    GROQ_API_KEY: Optional[str] = None
     OPENAI_API_KEY: Optional[str] = None
     GEMINI_API_KEY: Optional[str] = None
     DEFAULT_LLM_PROVIDER: str = "groq"
@@ -19,6 +19,42 @@ class Settings(BaseSettings):
     MONGODB_URL: str = "mongodb://mongodb:27017"
     MONGODB_DB: str = "paragonai"
     MONGODB_DB_NAME: Optional[str] = None  # For backward compatibility
+    MONGODB_MAX_POOL_SIZE: int = 50
+    MONGODB_MIN_POOL_SIZE: int = 5
+    MONGODB_MAX_IDLE_TIME_MS: int = 60000
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 2000
+    
+    # Worker Pools
+    CPU_WORKERS: int = 4
+    SUBPROCESS_WORKERS: int = 8
+    IO_WORKERS: int = 32
+    # Build service clients in the background after startup rather than on first use
+    WARM_SERVICES_ON_STARTUP: bool = True
+    
+    # Admission Control (per worker process)
+    ADMISSION_ENABLED: bool = True
+    # Requests per second and burst size allowed to each API key or client address
+    GENERATION_RATE_PER_CLIENT: float = 0.5
+    GENERATION_BURST_PER_CLIENT: int = 5
+    GENERATION_MAX_CONCURRENT: int = 8
+    DEPLOYMENT_RATE_PER_CLIENT: float = 0.2
+    DEPLOYMENT_BURST_PER_CLIENT: int = 3
+    DEPLOYMENT_MAX_CONCURRENT: int = 4
+    # How long an over-limit request may wait before it is rejected with 429
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    ADMISSION_MAX_QUEUED: int = 100
+    ADMISSION_MAX_CLIENTS: int = 10000
+    
+    # Idempotency Keys
+    IDEMPOTENCY_ROUTES: List[str] = ["/generate/", "/deployments/"]
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    # Lease on a claim, renewed every third of it while the request runs;
+    # a claim not renewed in time was left behind by a worker that died
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    # How long a duplicate waits for the original request before getting 409
+    IDEMPOTENCY_WAIT_SECONDS: float = 120.0
+    IDEMPOTENCY_POLL_SECONDS: float = 0.5
+    IDEMPOTENCY_LOCAL_MAX_RESPONSES: int = 10000
     
     # Docker Settings
     DOCKER_REGISTRY: str = "docker.io"
@@ -41,17 +77,62 @@ class Settings(BaseSettings):
     GCP_PROJECT_ID: Optional[str] = None
     GCP_SERVICE_ACCOUNT_KEY: Optional[str] = None
     
+    # Template Catalog Settings
+    TEMPLATE_CATALOG_POLL_SECONDS: float = 2.0
+    
     # Kubernetes Settings
     KUBECONFIG_PATH: Optional[str] = None
     DEFAULT_NAMESPACE: str = "default"
     
+    # Terraform Settings
+    TERRAFORM_PLUGIN_CACHE_DIR: str = "/tmp/paragon_terraform/plugin-cache"
+    TERRAFORM_MODULE_CACHE_DIR: str = "/tmp/paragon_terraform/modules"
+    TERRAFORM_PROVIDER_MIRROR_DIR: Optional[str] = None
+    TERRAFORM_PREWARM: bool = False
+    TERRAFORM_MAX_CONCURRENT_RUNS: int = 2
+    TERRAFORM_CANCEL_GRACE_SECONDS: int = 30
+    
     # Security Settings
     ENABLE_SECURITY_SCAN: bool = True
     TRIVY_ENABLED: bool = True
+    TRIVY_CACHE_DIR: str = "/tmp/paragon_scan_cache"
+    SCAN_WORKERS: int = 2
+    
+    # Request Logging Settings
+    REQUEST_LOG_ENABLED: bool = True
+    REQUEST_LOG_SAMPLE_RATE: float = 0.1
+    # Per route template; server errors are always logged
+    REQUEST_LOG_ROUTE_SAMPLE_RATES: Dict[str, float] = {
+        "/metrics": 0.0,
+        "/generate/": 1.0,
+        "/deployments/": 1.0
+    }
+    REQUEST_LOG_BODY_ROUTES: List[str] = ["/generate/", "/deployments/"]
+    REQUEST_LOG_BODY_MAX_BYTES: int = 2048
+    REQUEST_LOG_REDACT_HEADERS: List[str] = [
+        "authorization", "proxy-authorization", "cookie", "set-cookie", "x-api-key"
+    ]
+    REQUEST_LOG_MAX_QUEUED: int = 10000
     
     # Monitoring Settings
     PROMETHEUS_ENABLED: bool = True
+    EXPORTER_PORT: int = 8001
+    METRICS_SHARED_DIR: str = "/tmp/paragon_metrics"
+    METRICS_SNAPSHOT_SECONDS: float = 5.0
     GRAFANA_ENABLED: bool = True
+    METRICS_CACHE_MAX_BUCKETS: int = 50000
+    METRICS_CACHE_GRACE_SECONDS: int = 60
+    METRICS_BUFFER_MAX_EVENTS: int = 50000
+    METRICS_BUFFER_BATCH_SIZE: int = 1000
+    METRICS_BUFFER_FLUSH_SECONDS: float = 2.0
+    DEPLOYMENT_METRICS_CHECKPOINT_SECONDS: float = 30.0
+    METRICS_RAW_RETENTION_DAYS: int = 7
+    METRICS_MINUTE_RETENTION_DAYS: int = 30
+    METRICS_HOUR_RETENTION_DAYS: int = 400
+    METRICS_DOWNSAMPLED_RETENTION_DAYS: int = 730
+    METRICS_DOWNSAMPLE_INTERVAL_SECONDS: int = 300
+    TIMING_SLOW_RUNS: int = 50
+    TIMING_SLOW_RUN_WINDOW_SECONDS: float = 3600.0
     
     class Config:
         env_file = ".env"
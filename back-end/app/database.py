@@ -0,0 +1,136 @@
+from pymongo import AsyncMongoClient, monitoring
+from pymongo.asynchronous.database import AsyncDatabase
+from prometheus_client import Gauge, Histogram, Counter
+from typing import Optional, Dict, Any
+from app.config import settings
+from app.services.request_metrics_service import request_metrics_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Track connection pool utilization and checkout wait times"""
+    
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        
+        self.open_gauge = Gauge('mongodb_pool_connections', 'Open MongoDB pool connections')
+        self.checked_out_gauge = Gauge('mongodb_pool_checked_out', 'MongoDB connections currently in use')
+        self.wait_histogram = Histogram(
+            'mongodb_pool_wait_seconds',
+            'Time spent waiting to check out a MongoDB connection',
+            buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+        )
+        self.failure_counter = Counter(
+            'mongodb_pool_checkout_failures_total',
+            'Failed MongoDB connection checkouts',
+            ['reason']
+        )
+    
+    def connection_created(self, event):
+        self.open_connections += 1
+        self.open_gauge.set(self.open_connections)
+    
+    def connection_closed(self, event):
+        self.open_connections = max(self.open_connections - 1, 0)
+        self.open_gauge.set(self.open_connections)
+    
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.checkouts += 1
+        self.checked_out_gauge.set(self.checked_out)
+        if event.duration is not None:
+            self.total_wait_seconds += event.duration
+            self.max_wait_seconds = max(self.max_wait_seconds, event.duration)
+            self.wait_histogram.observe(event.duration)
+    
+    def connection_checked_in(self, event):
+        self.checked_out = max(self.checked_out - 1, 0)
+        self.checked_out_gauge.set(self.checked_out)
+    
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+        self.failure_counter.labels(reason=str(event.reason)).inc()
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+
+
+class Database:
+    """One pooled async MongoDB client shared for the lifetime of the application"""
+    
+    def __init__(self):
+        self.client: Optional[AsyncMongoClient] = None
+        self.pool_listener = PoolMetricsListener()
+    
+    def get_db(self) -> AsyncDatabase:
+        if self.client is None:
+            # The client connects lazily, so creating it here never blocks
+            self.client = AsyncMongoClient(
+                settings.MONGODB_URL,
+                maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+                minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+                maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                serverSelectionTimeoutMS=5000,  # 5 second timeout
+                connectTimeoutMS=10000,        # 10 second connection timeout
+                socketTimeoutMS=30000,         # 30 second socket timeout
+                event_listeners=[self.pool_listener]
+            )
+        return self.client[settings.MONGODB_DB]
+    
+    async def connect(self):
+        """Create the client and make sure the indexes queries rely on exist"""
+        db = self.get_db()
+        try:
+            await request_metrics_service.ensure_collections(db)
+            logger.info("Connected to MongoDB")
+        except Exception as e:
+            logger.warning(f"MongoDB not reachable at startup: {e}")
+    
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        listener = self.pool_listener
+        return {
+            "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+            "open_connections": listener.open_connections,
+            "checked_out": listener.checked_out,
+            "utilization": listener.checked_out / settings.MONGODB_MAX_POOL_SIZE,
+            "checkouts": listener.checkouts,
+            "checkout_failures": listener.checkout_failures,
+            "avg_wait_ms": (listener.total_wait_seconds / listener.checkouts * 1000) if listener.checkouts else 0.0,
+            "max_wait_ms": listener.max_wait_seconds * 1000
+        }
+
+
+database = Database()
+
+
+def get_database() -> AsyncDatabase:
+    """FastAPI dependency returning the shared database handle"""
+    return database.get_db()
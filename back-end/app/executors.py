@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from app.config import settings
+import asyncio
+import contextvars
+import functools
+
+
+class Executors:
+    """
+    Separate thread pools for blocking work, sized per kind of work.
+    
+    Route handlers await these instead of calling blocking services directly,
+    so a slow kubectl run or LLM call never stalls the event loop, and a burst
+    of one kind of work cannot starve the others.
+    """
+    
+    def __init__(self, cpu_workers: int, subprocess_workers: int, io_workers: int):
+        self.pools: Dict[str, ThreadPoolExecutor] = {
+            "cpu": ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="cpu"),
+            "subprocess": ThreadPoolExecutor(max_workers=subprocess_workers, thread_name_prefix="subprocess"),
+            "io": ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io"),
+        }
+    
+    async def _run(self, pool: str, func: Callable, *args, **kwargs) -> Any:
+        # Carry the caller's context variables into the worker thread, as asyncio.to_thread does
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.pools[pool], call)
+    
+    async def run_cpu(self, func: Callable, *args, **kwargs) -> Any:
+        """Rendering, hashing, archiving and other pure-Python work"""
+        return await self._run("cpu", func, *args, **kwargs)
+    
+    async def run_subprocess(self, func: Callable, *args, **kwargs) -> Any:
+        """Work that waits on kubectl, docker, terraform or other child processes"""
+        return await self._run("subprocess", func, *args, **kwargs)
+    
+    async def run_io(self, func: Callable, *args, **kwargs) -> Any:
+        """Blocking network and disk I/O such as LLM API calls"""
+        return await self._run("io", func, *args, **kwargs)
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {
+                "max_workers": pool._max_workers,
+                "threads": len(pool._threads),
+                "queued": pool._work_queue.qsize()
+            }
+            for name, pool in self.pools.items()
+        }
+    
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+executors = Executors(
+    cpu_workers=settings.CPU_WORKERS,
+    subprocess_workers=settings.SUBPROCESS_WORKERS,
+    io_workers=settings.IO_WORKERS
+)
@@ -0,0 +1,337 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from starlette.requests import Request
+from starlette.routing import Match
+from app.admission import client_identity
+from app.config import settings
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+MAX_KEY_LENGTH = 255
+
+# Status, raw headers and body of a completed response
+StoredResponse = Tuple[int, List[List[str]], bytes]
+
+
+class IdempotencyConflictError(Exception):
+    """The key was already used for a request with a different body"""
+
+
+class IdempotencyInProgressError(Exception):
+    """The original request is still running after the wait deadline"""
+
+
+class IdempotencyStore:
+    """
+    Claims on Idempotency-Key values, kept in MongoDB and mirrored per worker.
+
+    The first request with a key claims it as in progress. Duplicates arriving
+    while it runs wait for it; the worker holding the claim wakes its own
+    waiters directly, and other workers poll the stored entry. Successful
+    responses are stored until the entry expires and replayed to every later
+    request with the same key; each worker also keeps its most recent ones in
+    memory. Any other outcome releases the claim so a retry
+    runs again. A stored claim is a lease of `lock_seconds` that the worker
+    running the request renews while it runs, so only the claim of a worker
+    that died expires and can be taken over. While MongoDB is unreachable,
+    keys are only deduplicated within each worker.
+    """
+
+    def __init__(self, ttl_seconds: float, lock_seconds: float, wait_seconds: float, poll_interval: float,
+                 max_local_responses: int):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+        self.max_local_responses = max_local_responses
+        # Responses completed by this worker: fingerprint, response and expiry on the monotonic clock
+        self._completed: "OrderedDict[str, Tuple[str, StoredResponse, float]]" = OrderedDict()
+        # In-progress keys of this worker: fingerprint and the future its waiters await
+        self._local: Dict[str, Tuple[str, asyncio.Future]] = {}
+        # Keys this worker holds in MongoDB: claim owner token and the task renewing the lease
+        self._claims: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self._db: Optional[AsyncDatabase] = None
+        self._skip_db_until = 0.0
+
+    async def start(self, db: AsyncDatabase):
+        self._db = db
+        try:
+            await db[IDEMPOTENCY_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create idempotency key index: {e}")
+
+    def _use_db(self) -> bool:
+        return self._db is not None and monotonic() >= self._skip_db_until
+
+    def _db_failed(self, e: Exception):
+        # Avoid paying the server selection timeout on every request while MongoDB is down
+        logger.warning(f"Idempotency keys deduplicated per worker only: {e}")
+        self._skip_db_until = monotonic() + 30
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """Claim the key, or return the stored response of the request that already used it"""
+        deadline = monotonic() + self.wait_seconds
+        while True:
+            completed = self._completed.get(key)
+            if completed is not None and completed[2] > monotonic():
+                if completed[0] != fingerprint:
+                    raise IdempotencyConflictError(key)
+                return completed[1]
+
+            local = self._local.get(key)
+            if local is not None:
+                if local[0] != fingerprint:
+                    raise IdempotencyConflictError(key)
+                try:
+                    stored = await asyncio.wait_for(asyncio.shield(local[1]), max(deadline - monotonic(), 0))
+                except asyncio.TimeoutError:
+                    raise IdempotencyInProgressError(key)
+                if stored is not None:
+                    return stored
+                # The original failed without storing anything; claim the key for this retry
+                continue
+
+            if self._use_db():
+                owner = uuid.uuid4().hex
+                try:
+                    stored, claimed = await self._claim(key, fingerprint, owner)
+                except PyMongoError as e:
+                    self._db_failed(e)
+                else:
+                    if stored is not None:
+                        return stored
+                    if not claimed:
+                        # Another worker is running the original request
+                        if monotonic() >= deadline:
+                            raise IdempotencyInProgressError(key)
+                        await asyncio.sleep(self.poll_interval)
+                        continue
+                    self._claims[key] = (owner, asyncio.create_task(self._renew(key, owner)))
+
+            self._local[key] = (fingerprint, asyncio.get_running_loop().create_future())
+            return None
+
+    async def _claim(self, key: str, fingerprint: str, owner: str) -> Tuple[Optional[StoredResponse], bool]:
+        collection = self._db[IDEMPOTENCY_COLLECTION]
+        now = datetime.utcnow()
+        try:
+            await collection.insert_one({
+                "_id": key,
+                "status": "in_progress",
+                "fingerprint": fingerprint,
+                "owner": owner,
+                "expires_at": now + timedelta(seconds=self.lock_seconds)
+            })
+            return None, True
+        except DuplicateKeyError:
+            pass
+
+        doc = await collection.find_one({"_id": key})
+        if doc is None:
+            # Released or expired in the meantime
+            return await self._claim(key, fingerprint, owner)
+        if doc["fingerprint"] != fingerprint:
+            raise IdempotencyConflictError(key)
+        if doc["status"] == "completed":
+            response = doc["response"]
+            return (response["status"], response["headers"], bytes(response["body"])), False
+        if doc["expires_at"] <= now:
+            # The lease was not renewed, so the worker holding it died; take it
+            # over unless another request just did
+            result = await collection.update_one(
+                {"_id": key, "status": "in_progress", "expires_at": doc["expires_at"]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=self.lock_seconds)}}
+            )
+            return None, result.modified_count == 1
+        return None, False
+
+    async def _renew(self, key: str, owner: str):
+        """Extend the lease on a claim for as long as this worker runs its request"""
+        collection = self._db[IDEMPOTENCY_COLLECTION]
+        while True:
+            await asyncio.sleep(self.lock_seconds / 3)
+            try:
+                result = await collection.update_one(
+                    {"_id": key, "status": "in_progress", "owner": owner},
+                    {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lock_seconds)}}
+                )
+            except PyMongoError as e:
+                # Two more attempts remain before the lease runs out
+                logger.warning(f"Could not renew idempotency claim: {e}")
+                continue
+            if result.matched_count == 0:
+                logger.warning("Idempotency claim was taken over while its request was still running")
+                return
+
+    async def finish(self, key: str, response: Optional[StoredResponse]):
+        """Store a successful response under the key, or release the claim when there is none"""
+        local = self._local.pop(key, None)
+        if local is not None:
+            if response is not None:
+                self._completed[key] = (local[0], response, monotonic() + self.ttl_seconds)
+                while len(self._completed) > self.max_local_responses:
+                    self._completed.popitem(last=False)
+            if not local[1].done():
+                local[1].set_result(response)
+        claim = self._claims.pop(key, None)
+        if claim is None:
+            return
+        claim[1].cancel()
+        # Written even while MongoDB is skipped, so the claim does not sit in
+        # progress until its lease runs out; the owner filter leaves a claim
+        # alone that another worker has taken over
+        query = {"_id": key, "status": "in_progress", "owner": claim[0]}
+        collection = self._db[IDEMPOTENCY_COLLECTION]
+        try:
+            if response is None:
+                await collection.delete_one(query)
+            else:
+                status, headers, body = response
+                await collection.update_one(
+                    query,
+                    {"$set": {
+                        "status": "completed",
+                        "response": {"status": status, "headers": headers, "body": body},
+                        "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+                    }}
+                )
+        except PyMongoError as e:
+            self._db_failed(e)
+
+
+class IdempotencyMiddleware:
+    """
+    Pure ASGI middleware honouring the Idempotency-Key header on chosen POST routes.
+
+    Keys are scoped to the client and route, and bound to a hash of the
+    request body. Replayed responses carry `Idempotent-Replayed: true`.
+    """
+
+    def __init__(self, app, store: IdempotencyStore, routes: Iterable[str]):
+        self.app = app
+        self.store = store
+        self.routes = set(routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        idempotency_key = request.headers.get("idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._respond(scope, send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.extend(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        # Raw client credentials and keys are never stored, only this digest
+        key = hashlib.sha256(
+            "\0".join((client_identity(request), scope["path"], idempotency_key)).encode()
+        ).hexdigest()
+        fingerprint = hashlib.sha256(bytes(body)).hexdigest()
+        try:
+            stored = await self.store.begin(key, fingerprint)
+        except IdempotencyConflictError:
+            await self._respond(scope, send, 422, "Idempotency-Key was already used with a different request body")
+            return
+        except IdempotencyInProgressError:
+            await self._respond(scope, send, 409, "A request with this Idempotency-Key is still in progress",
+                                [(b"retry-after", b"5")])
+            return
+        if stored is not None:
+            status, headers, stored_body = stored
+            _label_route(scope)
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+                + [(b"idempotent-replayed", b"true")]
+            })
+            await send({"type": "http.response.body", "body": stored_body})
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": bytes(body), "more_body": False}
+            return await receive()
+
+        status = 500
+        response_headers: List[List[str]] = []
+        response_body = bytearray()
+        complete = False
+
+        async def send_capturing(message):
+            nonlocal status, complete
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.extend(
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message["headers"]
+                )
+            elif message["type"] == "http.response.body":
+                response_body.extend(message.get("body", b""))
+                complete = not message.get("more_body", False)
+            await send(message)
+
+        response: Optional[StoredResponse] = None
+        try:
+            await self.app(scope, replay_receive, send_capturing)
+            if complete and 200 <= status < 300:
+                response = (status, response_headers, bytes(response_body))
+        finally:
+            # Shielded so a client disconnect cannot leave the key claimed
+            await asyncio.shield(self.store.finish(key, response))
+
+    async def _respond(self, scope, send, status: int, detail: str, headers: List[Tuple[bytes, bytes]] = ()):
+        _label_route(scope)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")] + list(headers)
+        })
+        await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
+
+
+def _label_route(scope):
+    """Set the matched route on responses sent before routing, so metrics label them by route"""
+    app = scope.get("app")
+    if app is None:
+        return
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            scope["route"] = route
+            return
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_HOURS * 3600,
+    lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+    poll_interval=settings.IDEMPOTENCY_POLL_SECONDS,
+    max_local_responses=settings.IDEMPOTENCY_LOCAL_MAX_RESPONSES
+)
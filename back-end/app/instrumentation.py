@@ -0,0 +1,426 @@
+from bisect import bisect_left
+from datetime import datetime
+from time import perf_counter, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.request_metrics_service import LATENCY_BUCKETS
+from app.services.metrics_buffer import MetricsWriteBuffer, metrics_buffer
+from app.admission import Admission, admission
+from app.timing import STAGE_BUCKETS, StageTimings, stage_timings
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Write buffer counters summed across workers: (name, Prometheus type, help)
+BUFFER_METRICS = [
+    ("events", "gauge", "Request metric events waiting to be written"),
+    ("flushed_total", "counter", "Request metric events written to MongoDB"),
+    ("dropped_total", "counter", "Request metric events lost to a full buffer"),
+    ("sampled_out_total", "counter", "Request metric events skipped by pressure sampling"),
+    ("flush_failures_total", "counter", "Failed batch writes"),
+]
+
+# Admission control gauges per endpoint class, counted only for live workers: (name, help)
+ADMISSION_GAUGES = [
+    ("queued", "Requests waiting for a rate limit token or a concurrency slot"),
+    ("in_flight", "Admitted requests currently running"),
+]
+
+
+class RouteStats:
+    """Counters and latency histogram for one (method, route) pair"""
+    
+    __slots__ = ("statuses", "errors", "latency_sum", "latency_buckets")
+    
+    def __init__(self):
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+        self.latency_sum = 0.0
+        # One slot per LATENCY_BUCKETS bound plus +Inf, not cumulative
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+class RequestMetrics:
+    """In-memory request metrics rendered in the Prometheus text format"""
+    
+    def __init__(self, buffer: MetricsWriteBuffer):
+        self.buffer = buffer
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        # The route template is only known once routing finishes, so in-flight is per method
+        self.in_flight: Dict[str, int] = {}
+    
+    def start(self, method: str):
+        self.in_flight[method] = self.in_flight.get(method, 0) + 1
+    
+    def finish(self, method: str, route: str, status: int, duration: float):
+        self.in_flight[method] -= 1
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if status >= 400:
+            stats.errors += 1
+        stats.latency_sum += duration
+        stats.latency_buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.buffer.add({
+            "timestamp": datetime.utcnow(),
+            "method": method,
+            "endpoint": route,
+            "status": status,
+            "duration": duration
+        })
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable copy of the counters"""
+        return {
+            "routes": [
+                {
+                    "method": method,
+                    "route": route,
+                    "statuses": {str(status): count for status, count in stats.statuses.items()},
+                    "errors": stats.errors,
+                    "latency_sum": stats.latency_sum,
+                    "latency_buckets": list(stats.latency_buckets)
+                }
+                for (method, route), stats in self.routes.items()
+            ],
+            "in_flight": dict(self.in_flight)
+        }
+
+
+class SharedMetrics:
+    """
+    Request metrics summed across every worker process in the pod.
+    
+    Each worker periodically writes a snapshot of its counters to its own file
+    in a shared directory. A scrape of any worker adds its live counters to the
+    other workers' latest snapshots. Files are named by PID and process start
+    time, so a replacement worker that reuses a PID never overwrites the file
+    of the worker it replaced. Snapshots of exited workers stay in the sum so
+    counters never go backwards, but their in-flight gauges are ignored.
+    """
+    
+    def __init__(self, metrics: RequestMetrics, buffer: MetricsWriteBuffer, admission: Admission,
+                 stages: StageTimings, directory: str, interval: float):
+        self.metrics = metrics
+        self.buffer = buffer
+        self.admission = admission
+        self.stages = stages
+        self.directory = Path(directory)
+        self.interval = interval
+        self.worker_id = _worker_id(os.getpid())
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self.worker_id = _worker_id(os.getpid())
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._remove_previous_boot()
+        self.write()
+        self._task = asyncio.create_task(self._run())
+    
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.write()
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Could not write metrics snapshot: {e}")
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        snapshot = self.metrics.snapshot()
+        snapshot["buffer"] = self.buffer.snapshot()
+        snapshot["admission"] = self.admission.snapshot()
+        snapshot["stages"] = self.stages.snapshot()
+        return snapshot
+    
+    def write(self):
+        # Write then rename so readers never see a partial file
+        path = self.directory / f"worker-{self.worker_id}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self._snapshot()))
+        os.replace(temporary, path)
+    
+    def _remove_previous_boot(self):
+        """Drop snapshots left by a previous run of the container, which reuses PIDs"""
+        started = _container_started_at()
+        if started is None:
+            return
+        for path in self.directory.glob("worker-*.json"):
+            try:
+                if path.stat().st_mtime < started:
+                    path.unlink()
+            except OSError:
+                pass
+    
+    def _snapshots(self) -> List[Tuple[bool, Dict[str, Any]]]:
+        """This worker's live counters followed by the other workers' latest snapshots, with liveness"""
+        snapshots = [(True, self._snapshot())]
+        for path in self.directory.glob("worker-*.json"):
+            worker_id = path.stem[len("worker-"):]
+            if worker_id == self.worker_id:
+                continue
+            try:
+                snapshots.append((_is_running(worker_id), json.loads(path.read_text())))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+    
+    def collect(self) -> Tuple[Dict[Tuple[str, str], RouteStats], Dict[str, int], Dict[str, float],
+                               Dict[str, Dict[str, Any]], Dict[Tuple[str, str], list]]:
+        routes: Dict[Tuple[str, str], RouteStats] = {}
+        in_flight: Dict[str, int] = {}
+        buffer: Dict[str, float] = {}
+        admission: Dict[str, Dict[str, Any]] = {}
+        stages: Dict[Tuple[str, str], list] = {}
+        for alive, snapshot in self._snapshots():
+            for entry in snapshot["routes"]:
+                stats = routes.get((entry["method"], entry["route"]))
+                if stats is None:
+                    stats = routes[(entry["method"], entry["route"])] = RouteStats()
+                for status, count in entry["statuses"].items():
+                    stats.statuses[int(status)] = stats.statuses.get(int(status), 0) + count
+                stats.errors += entry["errors"]
+                stats.latency_sum += entry["latency_sum"]
+                for index, count in enumerate(entry["latency_buckets"]):
+                    stats.latency_buckets[index] += count
+            if alive:
+                for method, count in snapshot["in_flight"].items():
+                    in_flight[method] = in_flight.get(method, 0) + count
+            for key, value in snapshot["buffer"].items():
+                buffer[key] = buffer.get(key, 0) + value
+            # Snapshots written before admission control existed have no such key
+            for name, entry in snapshot.get("admission", {}).items():
+                totals = admission.setdefault(name, {"queued": 0, "in_flight": 0, "admitted": 0, "rejected": {}})
+                if alive:
+                    totals["queued"] += entry["queued"]
+                    totals["in_flight"] += entry["in_flight"]
+                totals["admitted"] += entry["admitted"]
+                for reason, count in entry["rejected"].items():
+                    totals["rejected"][reason] = totals["rejected"].get(reason, 0) + count
+            for entry in snapshot.get("stages", {}).get("histograms", []):
+                histogram = stages.get((entry["operation"], entry["stage"]))
+                if histogram is None:
+                    histogram = stages[(entry["operation"], entry["stage"])] = [0.0, [0] * (len(STAGE_BUCKETS) + 1)]
+                histogram[0] += entry["sum"]
+                for index, count in enumerate(entry["buckets"]):
+                    histogram[1][index] += count
+        return routes, in_flight, buffer, admission, stages
+    
+    def slowest_runs(self, operation: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Slowest recent generations or deployments across all workers, slowest first"""
+        cutoff = time() - self.stages.window
+        runs = []
+        for _, snapshot in self._snapshots():
+            for name, entries in snapshot.get("stages", {}).get("slowest", {}).items():
+                if operation is None or name == operation:
+                    runs += [entry for entry in entries if entry["finished"] > cutoff]
+        runs.sort(key=lambda entry: entry["duration"], reverse=True)
+        return runs[:limit]
+    
+    def render(self) -> str:
+        return render_metrics(*self.collect())
+
+
+def render_metrics(routes: Dict[Tuple[str, str], RouteStats], in_flight: Dict[str, int],
+                   buffer: Dict[str, float], admission: Dict[str, Dict[str, Any]],
+                   stages: Dict[Tuple[str, str], list]) -> str:
+    """Request, write buffer, admission control and stage timing metrics in the Prometheus text format"""
+    lines = [
+        "# HELP paragon_http_requests_total Total HTTP requests",
+        "# TYPE paragon_http_requests_total counter"
+    ]
+    for (method, route), stats in routes.items():
+        for status, count in stats.statuses.items():
+            lines.append(
+                f'paragon_http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}'
+            )
+    
+    lines += [
+        "# HELP paragon_http_errors_total HTTP requests answered with a 4xx or 5xx status",
+        "# TYPE paragon_http_errors_total counter"
+    ]
+    for (method, route), stats in routes.items():
+        lines.append(f'paragon_http_errors_total{{method="{method}",route="{route}"}} {stats.errors}')
+    
+    lines += [
+        "# HELP paragon_http_requests_in_flight Requests currently being served",
+        "# TYPE paragon_http_requests_in_flight gauge"
+    ]
+    for method, count in in_flight.items():
+        lines.append(f'paragon_http_requests_in_flight{{method="{method}"}} {count}')
+    
+    lines += [
+        "# HELP paragon_http_request_duration_seconds Request latency",
+        "# TYPE paragon_http_request_duration_seconds histogram"
+    ]
+    for (method, route), stats in routes.items():
+        labels = f'method="{method}",route="{route}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + [float("inf")], stats.latency_buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'paragon_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'paragon_http_request_duration_seconds_sum{{{labels}}} {stats.latency_sum}')
+        lines.append(f'paragon_http_request_duration_seconds_count{{{labels}}} {cumulative}')
+    
+    for name, kind, help_text in BUFFER_METRICS:
+        lines += [
+            f"# HELP paragon_metrics_buffer_{name} {help_text}",
+            f"# TYPE paragon_metrics_buffer_{name} {kind}",
+            f"paragon_metrics_buffer_{name} {buffer.get(name, 0)}"
+        ]
+    lines += [
+        "# HELP paragon_metrics_buffer_flush_seconds Time spent writing batches",
+        "# TYPE paragon_metrics_buffer_flush_seconds summary",
+        f"paragon_metrics_buffer_flush_seconds_sum {buffer.get('flush_seconds_sum', 0)}",
+        f"paragon_metrics_buffer_flush_seconds_count {buffer.get('flush_seconds_count', 0)}"
+    ]
+    
+    for name, help_text in ADMISSION_GAUGES:
+        lines += [
+            f"# HELP paragon_admission_{name} {help_text}",
+            f"# TYPE paragon_admission_{name} gauge"
+        ]
+        for endpoint_class, totals in admission.items():
+            lines.append(f'paragon_admission_{name}{{class="{endpoint_class}"}} {totals[name]}')
+    lines += [
+        "# HELP paragon_admission_admitted_total Requests admitted past the rate and concurrency limits",
+        "# TYPE paragon_admission_admitted_total counter"
+    ]
+    for endpoint_class, totals in admission.items():
+        lines.append(f'paragon_admission_admitted_total{{class="{endpoint_class}"}} {totals["admitted"]}')
+    lines += [
+        "# HELP paragon_admission_rejected_total Requests answered with 429",
+        "# TYPE paragon_admission_rejected_total counter"
+    ]
+    for endpoint_class, totals in admission.items():
+        for reason, count in totals["rejected"].items():
+            lines.append(f'paragon_admission_rejected_total{{class="{endpoint_class}",reason="{reason}"}} {count}')
+    
+    lines += [
+        "# HELP paragon_stage_duration_seconds Time spent in each stage of generations and deployments",
+        "# TYPE paragon_stage_duration_seconds histogram"
+    ]
+    for (operation, stage), (latency_sum, buckets) in stages.items():
+        labels = f'operation="{operation}",stage="{stage}"'
+        cumulative = 0
+        for bound, count in zip(STAGE_BUCKETS + [float("inf")], buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'paragon_stage_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'paragon_stage_duration_seconds_sum{{{labels}}} {latency_sum}')
+        lines.append(f'paragon_stage_duration_seconds_count{{{labels}}} {cumulative}')
+    
+    return "\n".join(lines) + "\n"
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _start_ticks(pid: int) -> Optional[int]:
+    """Start time of a process in clock ticks since boot; None if it is gone or off Linux"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22 (after the parenthesised command name) is the start time in clock ticks
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker_id(pid: int) -> str:
+    """PID plus process start time, unique even when PIDs are reused"""
+    ticks = _start_ticks(pid)
+    return f"{pid}-{ticks if ticks is not None else 'x' + uuid.uuid4().hex[:12]}"
+
+
+def _is_running(worker_id: str) -> bool:
+    """Whether the worker that wrote a snapshot is still running, not just another process with its PID"""
+    pid, _, tag = worker_id.partition("-")
+    try:
+        pid = int(pid)
+    except ValueError:
+        return False
+    if not _is_alive(pid):
+        return False
+    if tag.isdigit():
+        return _start_ticks(pid) == int(tag)
+    # Off Linux, and for snapshots named by PID alone, a live PID is the best evidence
+    return True
+
+
+def _container_started_at() -> Optional[float]:
+    """Wall-clock start time of PID 1, i.e. of the container; None off Linux"""
+    start_ticks = _start_ticks(1)
+    if start_ticks is None:
+        return None
+    try:
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, StopIteration, IndexError):
+        return None
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware timing every request with a few microseconds of overhead"""
+    
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        method = scope["method"]
+        self.metrics.start(method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by route template so path parameters cannot blow up cardinality
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            self.metrics.finish(method, path, status, perf_counter() - started)
+
+
+request_metrics = RequestMetrics(metrics_buffer)
+shared_metrics = SharedMetrics(
+    request_metrics,
+    metrics_buffer,
+    admission,
+    stage_timings,
+    directory=settings.METRICS_SHARED_DIR,
+    interval=settings.METRICS_SNAPSHOT_SECONDS
+)
@@ -41,14 +41,25 @@ class Deployment(BaseModel):
 
 
 class Metrics(BaseModel):
-    id: str = Field(alias="_id")
+    """Hourly per-deployment bucket downsampled from the request_metrics time series"""
+    id: str = Field(alias="_id")  # "<deployment_id>:<bucket start>"
     deployment_id: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime
     request_count: int = 0
     error_count: int = 0
     total_response_time: float = 0.0
     avg_response_time: float = 0.0
-    uptime_seconds: int = 0
+    latency_hist: Dict[str, int] = {}
     
     class Config:
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+
+class RequestMetric(BaseModel):
+    """One measurement in the request_metrics time-series collection"""
+    timestamp: datetime
+    deployment_id: Optional[str] = None  # metaField; absent for platform API requests
+    method: str
+    endpoint: str
+    status: int
+    duration: float
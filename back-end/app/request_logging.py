@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from time import perf_counter
+from typing import Any, Dict, Iterable, Optional
+from app.config import settings
+import json
+import logging
+import queue
+import random
+import sys
+
+BODY_METHODS = {"POST", "PUT", "PATCH"}
+
+request_logger = logging.getLogger("paragon.requests")
+request_logger.propagate = False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with structured fields passed as extra={"fields": ...}"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the writer falls behind"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the writer thread, not on the request path
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLog:
+    """Wires the request logger to a bounded queue drained by a background writer thread"""
+    
+    def __init__(self, max_queued: int):
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener: Optional[QueueListener] = None
+    
+    def start(self):
+        writer = logging.StreamHandler(sys.stdout)
+        writer.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, writer)
+        self.listener.start()
+        request_logger.addHandler(self.handler)
+        request_logger.setLevel(logging.INFO)
+    
+    def stop(self):
+        request_logger.removeHandler(self.handler)
+        if self.listener:
+            # Writes out everything still queued before returning
+            self.listener.stop()
+            self.listener = None
+
+
+class RequestLoggingMiddleware:
+    """
+    Pure ASGI middleware emitting one structured log line per sampled request.
+    
+    Requests are sampled per route template; server errors are always logged.
+    Request bodies are captured only for chosen routes, up to a byte cap, as
+    the application reads them, and sensitive headers are redacted.
+    """
+    
+    def __init__(self, app, default_rate: float, route_rates: Dict[str, float],
+                 body_routes: Iterable[str], body_max_bytes: int, redact_headers: Iterable[str]):
+        self.app = app
+        self.default_rate = default_rate
+        self.route_rates = route_rates
+        self.body_routes = set(body_routes)
+        self.body_max_bytes = body_max_bytes
+        self.redact_headers = {header.lower().encode("latin-1") for header in redact_headers}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = perf_counter()
+        status = 500
+        body: Optional[bytearray] = None
+        body_size = 0
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        if self.body_routes and scope["method"] in BODY_METHODS:
+            body = bytearray()
+            
+            async def receive_capturing():
+                nonlocal body_size
+                message = await receive()
+                if message["type"] == "http.request":
+                    chunk = message.get("body", b"")
+                    body_size += len(chunk)
+                    if len(body) < self.body_max_bytes:
+                        body.extend(chunk[:self.body_max_bytes - len(body)])
+                return message
+        else:
+            receive_capturing = receive
+        
+        try:
+            await self.app(scope, receive_capturing, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            rate = 1.0 if status >= 500 else self.route_rates.get(path, self.default_rate)
+            if rate >= 1.0 or (rate > 0.0 and random.random() < rate):
+                self._log(scope, path, status, perf_counter() - started,
+                          body if path in self.body_routes else None, body_size)
+    
+    def _log(self, scope, route: str, status: int, duration: float,
+             body: Optional[bytearray], body_size: int):
+        fields: Dict[str, Any] = {
+            "method": scope["method"],
+            "route": route,
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "client": scope["client"][0] if scope.get("client") else None,
+            "headers": {
+                name.decode("latin-1"): "[REDACTED]" if name in self.redact_headers else value.decode("latin-1")
+                for name, value in scope["headers"]
+            },
+        }
+        if body is not None:
+            fields["body"] = body.decode("utf-8", errors="replace")
+            fields["body_truncated"] = body_size > len(body)
+        request_logger.info("request", extra={"fields": fields})
+
+
+request_log = RequestLog(max_queued=settings.REQUEST_LOG_MAX_QUEUED)
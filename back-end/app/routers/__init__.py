@@ -4,3 +4,4 @@ from .generation import router as generation
 from .deployments import router as deployments
 from .agents import router as agents
 from .metrics import router as metrics
+from .terraform import router as terraform
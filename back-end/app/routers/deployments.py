@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from app.schemas import (
     DeploymentRequest, DeploymentResponse, DeploymentInfo,
@@ -6,6 +6,8 @@ from app.schemas import (
 )
 from app.services.deployment_service import deployment_service
 from app.services.kubernetes_service import kubernetes_service
+from app.executors import executors
+from app.admission import admission
 import logging
 import uuid
 
@@ -14,7 +16,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/deployments", tags=["deployments"])
 
 
-@router.post("/", response_model=DeploymentResponse)
+@router.post("/", response_model=DeploymentResponse, dependencies=[Depends(admission.limit("deployment"))])
 async def create_deployment(request: DeploymentRequest):
     """
     Deploy a generated agent to Kubernetes cluster.
@@ -25,7 +27,9 @@ async def create_deployment(request: DeploymentRequest):
     try:
         logger.info(f"Deploying generation {request.generation_id}")
         
-        result = deployment_service.deploy_to_kubernetes(
+        # kubectl runs off the event loop so other requests keep being served
+        result = await executors.run_subprocess(
+            deployment_service.deploy_to_kubernetes,
             generation_id=request.generation_id,
             namespace=request.namespace,
             replicas=request.replicas
@@ -72,11 +76,15 @@ async def delete_deployment(deployment_id: str, namespace: str = "default"):
         # In a real implementation, extract app_name from deployment record
         app_name = "agent-app"  # Placeholder
         
-        success = kubernetes_service.delete_resource("deployment", app_name, namespace)
+        success = await executors.run_subprocess(
+            kubernetes_service.delete_resource, "deployment", app_name, namespace
+        )
         if not success:
             raise HTTPException(status_code=500, detail="Failed to delete deployment")
         
-        kubernetes_service.delete_resource("service", f"{app_name}-service", namespace)
+        await executors.run_subprocess(
+            kubernetes_service.delete_resource, "service", f"{app_name}-service", namespace
+        )
         
         return {"message": "Deployment deleted successfully"}
     
@@ -96,7 +104,9 @@ async def rollback_deployment(deployment_id: str, request: RollbackRequest):
         namespace = "default"
         
         revision = int(request.target_version) if request.target_version else None
-        success = kubernetes_service.rollback_deployment(app_name, namespace, revision)
+        success = await executors.run_subprocess(
+            kubernetes_service.rollback_deployment, app_name, namespace, revision
+        )
         
         if not success:
             raise HTTPException(status_code=500, detail="Rollback failed")
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from app.schemas import GenerateRequest, GenerateResponse
 from app.services.deployment_service import deployment_service
+from app.executors import executors
 import logging
 import uuid
 
@@ -12,7 +13,9 @@ router = APIRouter(prefix="/generation", tags=["generation"])
 @router.post("/generate", response_model=GenerateResponse)
 async def generate(req: GenerateRequest):
     try:
-        result = deployment_service.generate_full_deployment(
+        # LLM calls dominate generation, so it runs on the network I/O pool
+        result = await executors.run_io(
+            deployment_service.generate_full_deployment,
             prompt=req.prompt,
             agent_type=req.agent_type,
             cloud_provider=req.cloud_provider,
@@ -35,9 +38,11 @@ async def generate(req: GenerateRequest):
         logger.error(f"Generation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
 from app.schemas import GenerateRequest, GenerateResponse
 from app.services.deployment_service import deployment_service
+from app.executors import executors
+from app.admission import admission
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,7 +50,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/generate", tags=["generation"])
 
 
-@router.post("/", response_model=GenerateResponse)
+@router.post("/", response_model=GenerateResponse, dependencies=[Depends(admission.limit("generation"))])
 async def generate_deployment(request: GenerateRequest, background_tasks: BackgroundTasks):
     """
     Generate complete deployment package from natural language prompt.
@@ -59,7 +64,9 @@ async def generate_deployment(request: GenerateRequest, background_tasks: Backgr
     try:
         logger.info(f"Received generation request: {request.prompt[:100]}...")
         
-        result = deployment_service.generate_full_deployment(
+        # LLM calls dominate generation, so it runs on the network I/O pool
+        result = await executors.run_io(
+            deployment_service.generate_full_deployment,
             prompt=request.prompt,
             agent_type=request.agent_type,
             cloud_provider=request.cloud_provider,
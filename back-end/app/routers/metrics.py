@@ -1,94 +1,131 @@
-from fastapi import APIRouter
-from datetime import datetime
-from app.schemas import MetricsResponse
-
-router = APIRouter(prefix="/metrics", tags=["metrics"])
-
-@router.get("/")
-async def test():
-    return "Hello Theere"
-
-
-@router.get("/{deployment_id}", response_model=MetricsResponse)
-async def get_metrics(deployment_id: str):
-    # Minimal mock implementation to keep API working
-    return MetricsResponse(
-        deployment_id=deployment_id,
-        request_count=100,
-        error_count=2,
-        avg_response_time=0.35,
-        uptime_percentage=99.5,
-        last_updated=datetime.utcnow(),
-    )
-
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
+from pymongo.asynchronous.database import AsyncDatabase
 import pymongo
 import logging
-from app.config import settings
+from app.database import database, get_database
+from app.services.request_metrics_service import RAW_COLLECTION, choose_rollup
+from app.services.metrics_cache import chart_cache
+from app.services.metrics_buffer import metrics_buffer
+from app.services.deployment_metrics import deployment_metrics
+from app.schemas import MetricsResponse, RequestEvent
+from app.executors import executors
+from app.admission import admission
+from app.instrumentation import shared_metrics
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
+# $dateTrunc counts bins from this reference date for minute, hour and day units
+BUCKET_REFERENCE = datetime(2000, 1, 1)
+INTERVAL_UNITS = {"m": "minute", "h": "hour", "d": "day"}
+
 class ChartData(BaseModel):
     labels: List[str]
     datasets: List[dict]
 
+@router.get("/database/pool")
+async def get_pool_stats():
+    """Connection pool utilization and checkout wait times of the shared MongoDB client"""
+    return database.pool_stats()
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Hit rate and size of the chart bucket cache"""
+    return chart_cache.stats()
+
+@router.get("/buffer")
+async def get_buffer_stats():
+    """Backlog, drop counts and flush latency of the request metrics write buffer"""
+    return metrics_buffer.stats()
+
+@router.get("/executors")
+async def get_executor_stats():
+    """Size and backlog of the CPU, subprocess and network I/O worker pools"""
+    return executors.stats()
+
+@router.get("/admission")
+async def get_admission_stats():
+    """Queue depth, in-flight work and rejections of the rate and concurrency limits"""
+    return admission.stats()
+
+@router.get("/slow-runs")
+async def get_slow_runs(operation: Optional[str] = None, limit: int = Query(20, ge=1, le=500)):
+    """Slowest recent generations and deployments across all workers, with the time spent in each stage"""
+    return {"runs": shared_metrics.slowest_runs(operation, limit)}
+
 @router.get("/requests/count", response_model=ChartData)
 async def get_request_counts(
     time_range: str = "24h", 
-    interval: str = "1h"
+    interval: str = "1h",
+    db: AsyncDatabase = Depends(get_database)
 ):
     try:
         logger.info(f"Fetching request counts for {time_range} with interval {interval}")
         
-        client = pymongo.MongoClient(
-            settings.MONGODB_URL,
-            serverSelectionTimeoutMS=5000,  # 5 second timeout
-            connectTimeoutMS=10000,        # 10 second connection timeout
-            socketTimeoutMS=30000          # 30 second socket timeout
-        )
+        bucket = parse_bucket(interval)
+        if not bucket:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid time range or interval"
+            )
+        unit, bin_size = bucket
         
-        try:
-            # Test the connection
-            client.admin.command('ping')
-            db = client[settings.MONGODB_DB]
-            
-            # Check if collection exists and has data
-            if 'request_metrics' not in db.list_collection_names():
-                logger.warning("request_metrics collection does not exist")
-                return create_empty_response("No metrics data available")
-            
-            collection = db.request_metrics
-            if collection.estimated_document_count() == 0:
-                logger.warning("request_metrics collection is empty")
-                return create_empty_response("No metrics data available")
-            
-            # Calculate time range
-            end_time = datetime.utcnow()
-            start_time = calculate_start_time(time_range, end_time)
-            
-            # Generate time buckets
-            time_buckets = generate_time_buckets(start_time, end_time, interval)
-            if not time_buckets:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid time range or interval"
+        # Calculate time range, aligned to the same bins $dateTrunc produces
+        end_time = datetime.utcnow()
+        start_time = calculate_start_time(time_range, end_time)
+        delta = parse_interval(interval)
+        first_bucket = align_to_bucket(start_time, delta)
+        last_bucket = align_to_bucket(end_time, delta)
+        
+        # Read pre-aggregated buckets whenever the interval allows it
+        rollup = choose_rollup(delta)
+        
+        async def query(query_start: datetime):
+            cursor = await db[rollup or RAW_COLLECTION].aggregate(
+                build_request_count_pipeline(
+                    query_start, last_bucket + delta, end_time, unit, bin_size, rollup=rollup is not None
                 )
-            
-            # Rest of your aggregation pipeline...
-            
+            )
+            return await cursor.to_list()
+        
+        try:
+            # Closed buckets come from the cache; only the open tail is queried
+            results = await chart_cache.get_series(
+                interval, first_bucket, last_bucket, delta, end_time, query
+            )
         except pymongo.errors.ServerSelectionTimeoutError:
             logger.error("MongoDB connection timeout")
             raise HTTPException(
                 status_code=503,
                 detail="Database connection timeout"
             )
-        finally:
-            client.close()
-            
+        
+        if not any(result["count"] for result in results):
+            return create_empty_response("No metrics data available")
+        
+        return ChartData(
+            labels=[result["bucket"].isoformat() for result in results],
+            datasets=[
+                {
+                    "label": "Requests",
+                    "data": [result["count"] for result in results],
+                    "borderColor": "rgb(75, 192, 192)",
+                    "tension": 0.1
+                },
+                {
+                    "label": "Errors",
+                    "data": [result["errors"] for result in results],
+                    "borderColor": "rgb(255, 99, 132)",
+                    "tension": 0.1
+                }
+            ]
+        )
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_request_counts: {str(e)}")
         raise HTTPException(
@@ -96,6 +133,72 @@ async def get_request_counts(
             detail=f"Internal server error: {str(e)}"
         )
 
+@router.post("/{deployment_id}/events")
+async def record_deployment_events(deployment_id: str, events: List[RequestEvent]):
+    """Record requests served by a deployed agent"""
+    now = datetime.utcnow()
+    for event in events:
+        timestamp = event.timestamp or now
+        deployment_metrics.record(deployment_id, event.status, event.duration, timestamp)
+        metrics_buffer.add({
+            "timestamp": timestamp,
+            "deployment_id": deployment_id,
+            "method": event.method,
+            "endpoint": event.endpoint,
+            "status": event.status,
+            "duration": event.duration
+        })
+    return {"accepted": len(events)}
+
+@router.get("/{deployment_id}", response_model=MetricsResponse)
+async def get_metrics(deployment_id: str):
+    """Running request metrics for one deployment, served from memory"""
+    metrics = deployment_metrics.get(deployment_id)
+    if metrics is None:
+        raise HTTPException(status_code=404, detail=f"No metrics recorded for deployment {deployment_id}")
+    return MetricsResponse(**metrics)
+
+def build_request_count_pipeline(first_bucket: datetime, bucket_end: datetime, end_time: datetime,
+                                 unit: str, bin_size: int, rollup: bool = False) -> List[dict]:
+    """Count requests and errors per time bucket, with empty buckets filled in"""
+    if rollup:
+        count = {"$sum": "$count"}
+        errors = {"$sum": "$errors"}
+    else:
+        count = {"$sum": 1}
+        errors = {"$sum": {"$cond": [{"$gte": ["$status", 400]}, 1, 0]}}
+    
+    return [
+        {"$match": {"timestamp": {"$gte": first_bucket, "$lt": end_time}}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size}},
+            "count": count,
+            "errors": errors
+        }},
+        {"$project": {"_id": 0, "bucket": "$_id", "count": 1, "errors": 1}},
+        {"$densify": {
+            "field": "bucket",
+            "range": {"step": bin_size, "unit": unit, "bounds": [first_bucket, bucket_end]}
+        }},
+        {"$fill": {"output": {"count": {"value": 0}, "errors": {"value": 0}}}},
+        {"$sort": {"bucket": 1}}
+    ]
+
+def align_to_bucket(moment: datetime, delta: timedelta) -> datetime:
+    """Round down to the start of the bucket $dateTrunc would put moment in"""
+    return BUCKET_REFERENCE + ((moment - BUCKET_REFERENCE) // delta) * delta
+
+def parse_bucket(interval: str) -> Optional[Tuple[str, int]]:
+    """Parse interval string into a $dateTrunc unit and bin size"""
+    unit = INTERVAL_UNITS.get(interval[-1:])
+    try:
+        bin_size = int(interval[:-1])
+    except ValueError:
+        return None
+    if not unit or bin_size <= 0:
+        return None
+    return unit, bin_size
+
 def create_empty_response(message: str) -> ChartData:
     """Helper to create an empty response with a message"""
     return ChartData(
@@ -120,21 +223,6 @@ def calculate_start_time(time_range: str, end_time: datetime) -> datetime:
         return end_time - timedelta(days=30)
     return end_time - timedelta(days=1)  # Default to 24h
 
-def generate_time_buckets(start: datetime, end: datetime, interval: str) -> List[datetime]:
-    """Generate time buckets based on interval"""
-    buckets = []
-    current = start
-    delta = parse_interval(interval)
-    
-    if not delta:
-        return []
-        
-    while current <= end:
-        buckets.append(current)
-        current += delta
-        
-    return buckets
-
 def parse_interval(interval: str) -> Optional[timedelta]:
     """Parse interval string into timedelta"""
     try:
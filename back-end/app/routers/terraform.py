@@ -0,0 +1,125 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pathlib import Path
+from app.schemas import (
+    TerraformRunRequest, TerraformJobResponse, TerraformAction, TerraformOutputsResponse
+)
+from app.services.deployment_service import deployment_service
+from app.services.terraform_service import terraform_service
+from app.executors import executors
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/terraform", tags=["terraform"])
+
+
+@router.post("/{generation_id}/runs", response_model=TerraformJobResponse, status_code=202)
+async def start_run(generation_id: str, request: TerraformRunRequest):
+    """
+    Start a Terraform plan, apply or destroy for a generated package.
+    
+    The run executes in the background; poll the returned job
+    or stream its output to follow progress.
+    """
+    working_dir = deployment_service.output_base_dir / generation_id / "terraform"
+    if not working_dir.exists():
+        raise HTTPException(status_code=404, detail="Terraform configuration not found")
+    if request.action != TerraformAction.PLAN and not request.auto_approve:
+        raise HTTPException(status_code=400, detail=f"{request.action.value} requires auto_approve")
+    if request.var_file and not is_inside(working_dir, request.var_file):
+        raise HTTPException(status_code=400, detail="var_file must be a relative path inside the Terraform configuration")
+    
+    job_id = terraform_service.submit(
+        request.action.value,
+        str(working_dir),
+        var_file=request.var_file,
+        auto_approve=request.auto_approve
+    )
+    logger.info(f"Started Terraform {request.action.value} job {job_id} for generation {generation_id}")
+    return terraform_service.get_job(job_id)
+
+
+@router.get("/{generation_id}/outputs", response_model=TerraformOutputsResponse)
+async def get_outputs(generation_id: str):
+    """
+    Get Terraform outputs recorded after the last successful apply.
+    
+    Sensitive outputs are listed by name but their values are withheld.
+    """
+    working_dir = deployment_service.output_base_dir / generation_id / "terraform"
+    record = None
+    if working_dir.exists():
+        # May fall back to running `terraform output` on older workspaces
+        record = await executors.run_subprocess(terraform_service.outputs, str(working_dir))
+    if record is None:
+        raise HTTPException(status_code=404, detail="No outputs recorded for this generation")
+    
+    values = {
+        name: value for name, value in record["values"].items()
+        if name not in record["sensitive"]
+    }
+    return TerraformOutputsResponse(
+        generation_id=generation_id,
+        values=values,
+        sensitive=record["sensitive"],
+        updated_at=record["updated_at"]
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=TerraformJobResponse)
+async def get_job(job_id: str):
+    """Get status, progress and parsed result of a Terraform job."""
+    job = terraform_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/logs")
+async def get_job_logs(job_id: str, offset: int = 0):
+    """Get Terraform output lines from offset onwards."""
+    output = terraform_service.get_job_output(job_id, offset)
+    if output is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return output
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job_logs(job_id: str, offset: int = 0):
+    """Stream Terraform output as plain text until the job finishes."""
+    if terraform_service.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def follow():
+        next_offset = offset
+        while True:
+            output = terraform_service.get_job_output(job_id, next_offset)
+            if output is None:
+                return
+            for line in output["lines"]:
+                yield f"{line['text']}\n"
+            next_offset = output["next_offset"]
+            if output["finished"]:
+                return
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(follow(), media_type="text/plain")
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running Terraform job."""
+    if terraform_service.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not terraform_service.cancel_job(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return {"message": "Cancellation requested"}
+
+
+def is_inside(working_dir: Path, relative_path: str) -> bool:
+    """Whether a client-supplied path names a file within the workspace"""
+    if Path(relative_path).is_absolute():
+        return False
+    return (working_dir / relative_path).resolve().is_relative_to(working_dir.resolve())
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Dict, List, Any
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 
 
@@ -97,15 +97,67 @@ class MetricsResponse(BaseModel):
     request_count: int
     error_count: int
     avg_response_time: float
+    p50_response_time: Optional[float] = None
+    p95_response_time: Optional[float] = None
+    p99_response_time: Optional[float] = None
     uptime_percentage: float
+    uptime_seconds: Optional[float] = None
     last_updated: datetime
 
 
+class RequestEvent(BaseModel):
+    status: int
+    duration: float  # seconds
+    method: str = "GET"
+    endpoint: str = "/"
+    timestamp: Optional[datetime] = None
+
+    @field_validator("timestamp")
+    @classmethod
+    def to_naive_utc(cls, timestamp: Optional[datetime]) -> Optional[datetime]:
+        # Stored and compared with naive UTC times from datetime.utcnow() and MongoDB
+        if timestamp is not None and timestamp.tzinfo is not None:
+            return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return timestamp
+
+
 class RollbackRequest(BaseModel):
     deployment_id: str
     target_version: Optional[str] = None
 
 
+class TerraformAction(str, Enum):
+    PLAN = "plan"
+    APPLY = "apply"
+    DESTROY = "destroy"
+
+
+class TerraformRunRequest(BaseModel):
+    action: TerraformAction
+    var_file: Optional[str] = None
+    auto_approve: bool = False
+
+
+class TerraformJobResponse(BaseModel):
+    job_id: str
+    action: TerraformAction
+    status: str
+    progress: Dict[str, int]
+    result: Dict[str, Any]
+    returncode: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class TerraformOutputsResponse(BaseModel):
+    generation_id: str
+    values: Dict[str, Any]
+    sensitive: List[str] = []
+    updated_at: datetime
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
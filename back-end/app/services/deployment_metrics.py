@@ -0,0 +1,240 @@
+from pymongo import UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from app.config import settings
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "deployment_metrics"
+
+# Log-spaced latency buckets from 100us to about 10 minutes, each 5% wider than
+# the last, so quantiles are accurate to a few percent in a fixed-size array
+SKETCH_MIN_SECONDS = 0.0001
+SKETCH_GROWTH = 1.05
+SKETCH_SIZE = 330
+_LOG_GROWTH = math.log(SKETCH_GROWTH)
+
+
+def sketch_index(duration: float) -> int:
+    if duration <= SKETCH_MIN_SECONDS:
+        return 0
+    return min(SKETCH_SIZE - 1, int(math.log(duration / SKETCH_MIN_SECONDS) / _LOG_GROWTH) + 1)
+
+
+def sketch_value(index: int) -> float:
+    """Upper bound of a sketch bucket"""
+    return SKETCH_MIN_SECONDS * SKETCH_GROWTH ** index
+
+
+class DeploymentStats:
+    """Running aggregates for one deployment; every field is additive"""
+    
+    __slots__ = ("count", "errors", "latency_sum", "latency_buckets",
+                 "up_minutes", "observed_minutes", "first_seen", "last_updated")
+    
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_buckets: Dict[int, int] = {}
+        self.up_minutes = 0
+        self.observed_minutes = 0
+        self.first_seen: Optional[datetime] = None
+        self.last_updated: Optional[datetime] = None
+    
+    def add(self, other: "DeploymentStats"):
+        self.count += other.count
+        self.errors += other.errors
+        self.latency_sum += other.latency_sum
+        for index, count in other.latency_buckets.items():
+            self.latency_buckets[index] = self.latency_buckets.get(index, 0) + count
+        self.up_minutes += other.up_minutes
+        self.observed_minutes += other.observed_minutes
+        if other.first_seen and (self.first_seen is None or other.first_seen < self.first_seen):
+            self.first_seen = other.first_seen
+        if other.last_updated and (self.last_updated is None or other.last_updated > self.last_updated):
+            self.last_updated = other.last_updated
+    
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.latency_buckets):
+            seen += self.latency_buckets[index]
+            if seen >= rank:
+                return sketch_value(index)
+        return sketch_value(SKETCH_SIZE - 1)
+    
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "DeploymentStats":
+        stats = cls()
+        stats.count = doc.get("count", 0)
+        stats.errors = doc.get("errors", 0)
+        stats.latency_sum = doc.get("latency_sum", 0.0)
+        stats.latency_buckets = {int(k): v for k, v in doc.get("latency_buckets", {}).items()}
+        stats.up_minutes = doc.get("up_minutes", 0)
+        stats.observed_minutes = doc.get("observed_minutes", 0)
+        stats.first_seen = doc.get("first_seen")
+        stats.last_updated = doc.get("last_updated")
+        return stats
+    
+    def to_update(self) -> Dict[str, Any]:
+        """Mongo update applying these aggregates as increments"""
+        increments = {
+            "count": self.count,
+            "errors": self.errors,
+            "latency_sum": self.latency_sum,
+            "up_minutes": self.up_minutes,
+            "observed_minutes": self.observed_minutes,
+        }
+        for index, count in self.latency_buckets.items():
+            increments[f"latency_buckets.{index}"] = count
+        update = {"$inc": increments}
+        if self.first_seen:
+            update["$min"] = {"first_seen": self.first_seen}
+        if self.last_updated:
+            update["$max"] = {"last_updated": self.last_updated}
+        return update
+
+
+class DeploymentMetricsStore:
+    """
+    Per-deployment request metrics kept in memory.
+    
+    Recording and reading are dictionary lookups. Local increments are
+    checkpointed to MongoDB as $inc deltas and the merged documents are read
+    back, so totals recorded by other workers flow in as well.
+    """
+    
+    def __init__(self, checkpoint_interval: float):
+        self.checkpoint_interval = checkpoint_interval
+        self.totals: Dict[str, DeploymentStats] = {}
+        self.pending: Dict[str, DeploymentStats] = {}
+        # deployment_id -> [minute, requests, server errors] for the minute in progress
+        self.current_minute: Dict[str, List[int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._db: Optional[AsyncDatabase] = None
+    
+    def record(self, deployment_id: str, status: int, duration: float, timestamp: datetime):
+        totals = self.totals.get(deployment_id)
+        if totals is None:
+            totals = self.totals[deployment_id] = DeploymentStats()
+        pending = self.pending.get(deployment_id)
+        if pending is None:
+            pending = self.pending[deployment_id] = DeploymentStats()
+        
+        index = sketch_index(duration)
+        is_error = status >= 400
+        for stats in (totals, pending):
+            stats.count += 1
+            stats.errors += is_error
+            stats.latency_sum += duration
+            stats.latency_buckets[index] = stats.latency_buckets.get(index, 0) + 1
+            if stats.first_seen is None or timestamp < stats.first_seen:
+                stats.first_seen = timestamp
+            if stats.last_updated is None or timestamp > stats.last_updated:
+                stats.last_updated = timestamp
+        
+        # A minute counts as down when most of its requests failed server-side
+        minute = int(timestamp.timestamp() // 60)
+        slot = self.current_minute.get(deployment_id)
+        if slot is None or slot[0] != minute:
+            if slot is not None:
+                self._close_minute(deployment_id, slot)
+            slot = self.current_minute[deployment_id] = [minute, 0, 0]
+        slot[1] += 1
+        slot[2] += status >= 500
+    
+    def _close_minute(self, deployment_id: str, slot: List[int]):
+        up = slot[2] * 2 < slot[1]
+        for stats in (self.totals[deployment_id], self.pending.setdefault(deployment_id, DeploymentStats())):
+            stats.observed_minutes += 1
+            stats.up_minutes += up
+    
+    def get(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        stats = self.totals.get(deployment_id)
+        if stats is None:
+            return None
+        return {
+            "deployment_id": deployment_id,
+            "request_count": stats.count,
+            "error_count": stats.errors,
+            "avg_response_time": stats.latency_sum / stats.count if stats.count else 0.0,
+            "p50_response_time": stats.quantile(0.50),
+            "p95_response_time": stats.quantile(0.95),
+            "p99_response_time": stats.quantile(0.99),
+            "uptime_percentage": (
+                stats.up_minutes / stats.observed_minutes * 100 if stats.observed_minutes else 100.0
+            ),
+            "uptime_seconds": (
+                (stats.last_updated - stats.first_seen).total_seconds() if stats.first_seen else 0.0
+            ),
+            "last_updated": stats.last_updated
+        }
+    
+    async def load(self, db: AsyncDatabase):
+        cursor = db[COLLECTION].find({})
+        for doc in await cursor.to_list():
+            stats = DeploymentStats.from_document(doc)
+            pending = self.pending.get(doc["_id"])
+            if pending:
+                stats.add(pending)
+            self.totals[doc["_id"]] = stats
+        logger.debug(f"Loaded metrics for {len(self.totals)} deployments")
+    
+    async def start(self, db: AsyncDatabase):
+        self._db = db
+        try:
+            await self.load(db)
+        except Exception as e:
+            logger.warning(f"Could not load deployment metrics checkpoint: {e}")
+        self._task = asyncio.create_task(self._run())
+    
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db is not None:
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                logger.warning(f"Final deployment metrics checkpoint failed: {e}")
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                logger.warning(f"Deployment metrics checkpoint failed: {e}")
+    
+    async def checkpoint(self):
+        """Push local increments to MongoDB, then pick up every worker's totals"""
+        pending, self.pending = self.pending, {}
+        if pending:
+            operations = [
+                UpdateOne({"_id": deployment_id}, delta.to_update(), upsert=True)
+                for deployment_id, delta in pending.items()
+            ]
+            try:
+                await self._db[COLLECTION].bulk_write(operations, ordered=False)
+            except Exception:
+                # Keep the increments for the next checkpoint
+                for deployment_id, delta in pending.items():
+                    self.pending.setdefault(deployment_id, DeploymentStats()).add(delta)
+                raise
+        await self.load(self._db)
+
+
+deployment_metrics = DeploymentMetricsStore(
+    checkpoint_interval=settings.DEPLOYMENT_METRICS_CHECKPOINT_SECONDS
+)
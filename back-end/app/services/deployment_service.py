@@ -13,6 +13,7 @@ from app.services.terraform_service import terraform_service
 from app.services.cicd_service import cicd_service
 from app.services.monitoring_service import monitoring_service
 from app.schemas import AgentType, CloudProvider, DeploymentStatus
+from app.timing import span, stage_timings
 
 logger = logging.getLogger(__name__)
 
@@ -20,20 +21,21 @@ logger = logging.getLogger(__name__)
 class DeploymentService:
     def __init__(self):
         self.output_base_dir = Path("/tmp/paragon_generations")
-        self.output_base_dir.mkdir(exist_ok=True)
     
+    @stage_timings.timed("generation", key="generation_id")
     def generate_full_deployment(self, prompt: str, agent_type: Optional[AgentType], 
                                 cloud_provider: CloudProvider, enable_monitoring: bool,
                                 enable_cicd: bool, enable_security_scan: bool) -> Dict[str, Any]:
         """Generate complete deployment package from prompt"""
         generation_id = str(uuid.uuid4())
         output_dir = self.output_base_dir / generation_id
-        output_dir.mkdir(exist_ok=True)
+        output_dir.mkdir(parents=True, exist_ok=True)
         
         try:
             # Parse prompt using LLM
             logger.info(f"Parsing deployment prompt for generation {generation_id}")
-            parsed_requirements = llm_service.parse_deployment_prompt(prompt)
+            with span("llm"):
+                parsed_requirements = llm_service.parse_deployment_prompt(prompt)
             
             # Override with explicit parameters if provided
             if agent_type:
@@ -44,114 +46,24 @@ class DeploymentService:
             
             # Generate agent code
             logger.info("Generating agent code")
-            agent_code = llm_service.generate_agent_code(
-                parsed_requirements["agent_type"],
-                parsed_requirements
-            )
+            with span("llm"):
+                agent_code = llm_service.generate_agent_code(
+                    parsed_requirements["agent_type"],
+                    parsed_requirements
+                )
             
-            # Write agent code
-            (output_dir / "main.py").write_text(agent_code)
+            # Render every file first, then write them out, so each stage is timed on its own
+            with span("render"):
+                files = self._render_files(app_name, agent_code, parsed_requirements, cloud_provider,
+                                           enable_monitoring, enable_cicd)
             
-            # Generate requirements.txt
-            requirements = self._generate_requirements(parsed_requirements["agent_type"])
-            (output_dir / "requirements.txt").write_text(requirements)
+            with span("disk"):
+                for relative_path, content in files.items():
+                    path = output_dir / relative_path
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_text(content)
             
-            # Generate Dockerfile
-            logger.info("Generating Dockerfile")
-            dockerfile_context = {
-                "port": 8000,
-                "app_name": app_name
-            }
-            dockerfile = template_service.render_dockerfile(dockerfile_context)
-            (output_dir / "Dockerfile").write_text(dockerfile)
-            
-            # Generate Kubernetes manifests
-            logger.info("Generating Kubernetes manifests")
-            k8s_dir = output_dir / "kubernetes"
-            k8s_dir.mkdir(exist_ok=True)
-            
-            k8s_context = {
-                "app_name": app_name,
-                "namespace": "default",
-                "version": "v1",
-                "replicas": parsed_requirements.get("scale_requirements", {}).get("replicas", 1),
-                "image": f"<registry>/{app_name}:latest",
-                "port": 8000,
-                "env_vars": {},
-                "memory_request": "256Mi",
-                "cpu_request": "100m",
-                "memory_limit": "512Mi",
-                "cpu_limit": "500m",
-                "service_type": "LoadBalancer"
-            }
-            
-            deployment_yaml = template_service.render_kubernetes_deployment(k8s_context)
-            (k8s_dir / "deployment.yaml").write_text(deployment_yaml)
-            
-            service_yaml = template_service.render_kubernetes_service(k8s_context)
-            (k8s_dir / "service.yaml").write_text(service_yaml)
-            
-            # Generate Terraform if AWS
-            if cloud_provider == CloudProvider.AWS:
-                logger.info("Generating Terraform configuration")
-                terraform_dir = output_dir / "terraform"
-                terraform_dir.mkdir(exist_ok=True)
-                
-                terraform_context = {
-                    "cluster_name": f"{app_name}-cluster",
-                    "aws_region": "us-east-1",
-                    "min_nodes": 1,
-                    "max_nodes": 5,
-                    "desired_nodes": 2,
-                    "instance_type": "t3.medium"
-                }
-                
-                terraform_config = template_service.render_terraform_eks(terraform_context)
-                (terraform_dir / "main.tf").write_text(terraform_config)
-            
-            # Generate CI/CD pipeline
-            if enable_cicd:
-                logger.info("Generating CI/CD pipeline")
-                cicd_dir = output_dir / ".github" / "workflows"
-                cicd_dir.mkdir(parents=True, exist_ok=True)
-                
-                cicd_context = {
-                    "app_name": app_name,
-                    "aws_region": "us-east-1",
-                    "ecr_repository": app_name,
-                    "cluster_name": f"{app_name}-cluster",
-                    "namespace": "default"
-                }
-                
-                github_workflow = cicd_service.generate_github_actions(cicd_context)
-                (cicd_dir / "deploy.yml").write_text(github_workflow)
-            
-            # Generate monitoring configs
-            if enable_monitoring:
-                logger.info("Generating monitoring configuration")
-                monitoring_dir = output_dir / "monitoring"
-                monitoring_dir.mkdir(exist_ok=True)
-                
-                monitoring_context = {
-                    "app_name": app_name,
-                    "namespace": "default"
-                }
-                
-                prometheus_config = monitoring_service.generate_prometheus_config(monitoring_context)
-                (monitoring_dir / "prometheus.yaml").write_text(prometheus_config)
-                
-                grafana_config = monitoring_service.generate_grafana_config(monitoring_context)
-                (monitoring_dir / "grafana.yaml").write_text(grafana_config)
-                
-                dashboard = monitoring_service.generate_grafana_dashboard(monitoring_context)
-                (monitoring_dir / "dashboard.json").write_text(dashboard)
-            
-            # Generate README
-            readme = self._generate_readme(app_name, parsed_requirements, cloud_provider)
-            (output_dir / "README.md").write_text(readme)
-            
-            # List all generated files
-            files_generated = [str(f.relative_to(output_dir)) for f in output_dir.rglob("*") if f.is_file()]
+            files_generated = list(files)
             
             logger.info(f"Generation complete: {len(files_generated)} files created")
             
@@ -172,6 +84,7 @@ class DeploymentService:
                 "files_generated": []
             }
     
+    @stage_timings.timed("deployment", key="generation_id")
     def deploy_to_kubernetes(self, generation_id: str, namespace: str, 
                             replicas: int) -> Dict[str, Any]:
         """Deploy generated application to Kubernetes"""
@@ -182,19 +95,22 @@ class DeploymentService:
         
         try:
             # Create namespace
-            kubernetes_service.create_namespace(namespace)
+            with span("namespace"):
+                kubernetes_service.create_namespace(namespace)
             
             # Apply Kubernetes manifests
             k8s_dir = output_dir / "kubernetes"
             for manifest in k8s_dir.glob("*.yaml"):
-                success = kubernetes_service.apply_manifest(str(manifest))
+                with span("apply"):
+                    success = kubernetes_service.apply_manifest(str(manifest))
                 if not success:
                     return {"status": "failed", "error": f"Failed to apply {manifest.name}"}
             
             # Get deployment status
-            app_name = self._extract_app_name(output_dir)
-            status = kubernetes_service.get_deployment_status(app_name, namespace)
-            endpoint = kubernetes_service.get_service_endpoint(f"{app_name}-service", namespace)
+            with span("status"):
+                app_name = self._extract_app_name(output_dir)
+                status = kubernetes_service.get_deployment_status(app_name, namespace)
+                endpoint = kubernetes_service.get_service_endpoint(f"{app_name}-service", namespace)
             
             return {
                 "status": "deployed" if status.get("ready") else "deploying",
@@ -206,6 +122,83 @@ class DeploymentService:
             logger.error(f"Deployment failed: {e}", exc_info=True)
             return {"status": "failed", "error": str(e)}
     
+    def _render_files(self, app_name: str, agent_code: str, parsed_requirements: Dict[str, Any],
+                      cloud_provider: CloudProvider, enable_monitoring: bool,
+                      enable_cicd: bool) -> Dict[str, str]:
+        """Render the deployment package as file contents keyed by path relative to the output directory"""
+        files = {"main.py": agent_code}
+        
+        # Generate requirements.txt
+        files["requirements.txt"] = self._generate_requirements(parsed_requirements["agent_type"])
+        
+        # Generate Dockerfile
+        logger.info("Generating Dockerfile")
+        dockerfile_context = {
+            "port": 8000,
+            "app_name": app_name
+        }
+        files["Dockerfile"] = template_service.render_dockerfile(dockerfile_context)
+        files[".dockerignore"] = template_service.render_dockerignore(dockerfile_context)
+        
+        # Generate Kubernetes manifests
+        logger.info("Generating Kubernetes manifests")
+        k8s_context = {
+            "app_name": app_name,
+            "namespace": "default",
+            "version": "v1",
+            "replicas": parsed_requirements.get("scale_requirements", {}).get("replicas", 1),
+            "image": f"<registry>/{app_name}:latest",
+            "port": 8000,
+            "env_vars": {},
+            "memory_request": "256Mi",
+            "cpu_request": "100m",
+            "memory_limit": "512Mi",
+            "cpu_limit": "500m",
+            "service_type": "LoadBalancer"
+        }
+        files["kubernetes/deployment.yaml"] = template_service.render_kubernetes_deployment(k8s_context)
+        files["kubernetes/service.yaml"] = template_service.render_kubernetes_service(k8s_context)
+        
+        # Generate Terraform if AWS
+        if cloud_provider == CloudProvider.AWS:
+            logger.info("Generating Terraform configuration")
+            terraform_context = {
+                "cluster_name": f"{app_name}-cluster",
+                "aws_region": "us-east-1",
+                "min_nodes": 1,
+                "max_nodes": 5,
+                "desired_nodes": 2,
+                "instance_type": "t3.medium"
+            }
+            files["terraform/main.tf"] = template_service.render_terraform_eks(terraform_context)
+        
+        # Generate CI/CD pipeline
+        if enable_cicd:
+            logger.info("Generating CI/CD pipeline")
+            cicd_context = {
+                "app_name": app_name,
+                "aws_region": "us-east-1",
+                "ecr_repository": app_name,
+                "cluster_name": f"{app_name}-cluster",
+                "namespace": "default"
+            }
+            files[".github/workflows/deploy.yml"] = cicd_service.generate_github_actions(cicd_context)
+        
+        # Generate monitoring configs
+        if enable_monitoring:
+            logger.info("Generating monitoring configuration")
+            monitoring_context = {
+                "app_name": app_name,
+                "namespace": "default"
+            }
+            files["monitoring/prometheus.yaml"] = monitoring_service.generate_prometheus_config(monitoring_context)
+            files["monitoring/grafana.yaml"] = monitoring_service.generate_grafana_config(monitoring_context)
+            files["monitoring/dashboard.json"] = monitoring_service.generate_grafana_dashboard(monitoring_context)
+        
+        # Generate README
+        files["README.md"] = self._generate_readme(app_name, parsed_requirements, cloud_provider)
+        return files
+    
     def _generate_requirements(self, agent_type: str) -> str:
         """Generate requirements.txt based on agent type"""
         base_requirements = [
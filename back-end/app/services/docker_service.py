@@ -1,49 +1,194 @@
-import docker
 import subprocess
+import fnmatch
+import glob
+import io
+import json
+import tarfile
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict, Any, Tuple
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW", "UNKNOWN"]
+TRIVY_DB_VERSION_TTL = 300
+MAX_SCAN_JOBS = 500
+MAX_BUILD_REPORTS = 200
+
 
 class DockerService:
     def __init__(self):
-        try:
-            self.client = docker.from_env()
-        except Exception as e:
-            logger.warning(f"Docker client initialization failed: {e}")
-            self.client = None
+        self._client = None
+        self._client_checked = False
+        self._client_lock = threading.Lock()
+        
+        self.build_reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._build_lock = threading.Lock()
+        self.scan_cache_dir = Path(settings.TRIVY_CACHE_DIR)
+        self.scan_executor = ThreadPoolExecutor(
+            max_workers=settings.SCAN_WORKERS,
+            thread_name_prefix="trivy-scan"
+        )
+        self.scan_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.scan_summaries: Dict[str, Dict[str, Any]] = {}
+        self._scan_lock = threading.Lock()
+        self._trivy_db_version: Optional[str] = None
+        self._trivy_db_checked_at = 0.0
+    
+    @property
+    def client(self):
+        """Docker client, connected on first use; None when no daemon is reachable"""
+        if not self._client_checked:
+            # The startup warm-up and the first request may get here together
+            with self._client_lock:
+                if not self._client_checked:
+                    try:
+                        import docker
+                        self._client = docker.from_env()
+                    except Exception as e:
+                        logger.warning(f"Docker client initialization failed: {e}")
+                    self._client_checked = True
+        return self._client
     
     def build_image(self, context_path: str, image_name: str, tag: str = "latest") -> bool:
-        """Build Docker image from context path"""
+        """Build Docker image from a minimal in-memory context of context path"""
         try:
             full_tag = f"{image_name}:{tag}"
             logger.info(f"Building image: {full_tag}")
             
+            context, file_count = self._create_build_context(Path(context_path))
+            context_bytes = context.getbuffer().nbytes
+            started = time.perf_counter()
+            
             if self.client:
-                image, logs = self.client.images.build(
-                    path=context_path,
+                stream = self.client.api.build(
+                    fileobj=context,
+                    custom_context=True,
                     tag=full_tag,
                     rm=True,
-                    forcerm=True
+                    forcerm=True,
+                    decode=True
                 )
-                for log in logs:
+                # The daemon only starts streaming output once the context is uploaded
+                upload_seconds = time.perf_counter() - started
+                success = True
+                for log in stream:
                     if 'stream' in log:
                         logger.debug(log['stream'].strip())
-                return True
+                    elif 'error' in log:
+                        logger.error(f"Build failed: {log['error'].strip()}")
+                        success = False
             else:
                 result = subprocess.run(
-                    ["docker", "build", "-t", full_tag, context_path],
-                    capture_output=True,
-                    text=True
+                    ["docker", "build", "-t", full_tag, "-"],
+                    input=context.getvalue(),
+                    capture_output=True
                 )
-                return result.returncode == 0
+                upload_seconds = None
+                success = result.returncode == 0
+            
+            self._store_build_report(full_tag, {
+                "context_bytes": context_bytes,
+                "context_files": file_count,
+                "upload_seconds": upload_seconds,
+                "build_seconds": time.perf_counter() - started,
+                "success": success
+            })
+            logger.info(
+                f"Build of {full_tag} sent {file_count} files ({context_bytes} bytes) "
+                f"in {upload_seconds if upload_seconds is not None else 'n/a'}s"
+            )
+            return success
         except Exception as e:
             logger.error(f"Failed to build image: {e}")
             return False
     
+    def _store_build_report(self, full_tag: str, report: Dict[str, Any]):
+        """Keep the latest report per tag, dropping the oldest tags once full"""
+        with self._build_lock:
+            self.build_reports.pop(full_tag, None)
+            self.build_reports[full_tag] = report
+            while len(self.build_reports) > MAX_BUILD_REPORTS:
+                self.build_reports.popitem(last=False)
+    
+    def _create_build_context(self, context_dir: Path) -> Tuple[io.BytesIO, int]:
+        """Tar only the files the Dockerfile copies, honouring .dockerignore"""
+        dockerfile = context_dir / "Dockerfile"
+        ignore_patterns = self._read_dockerignore(context_dir)
+        
+        root = context_dir.resolve()
+        files = set()
+        for source in self._dockerfile_sources(dockerfile.read_text()):
+            source = source.lstrip("/") or "."
+            if glob.has_magic(source):
+                # A pattern matching nothing may use syntax glob does not know;
+                # send everything rather than leave files out of the build
+                matches = [match.resolve() for match in root.glob(source)] or [root]
+            else:
+                matches = [(root / source).resolve()]
+            for source_path in matches:
+                if not source_path.is_relative_to(root):
+                    continue
+                candidates = [source_path] if source_path.is_file() else source_path.rglob("*")
+                for candidate in candidates:
+                    relative = candidate.relative_to(root).as_posix()
+                    if candidate.is_file() and not self._is_dockerignored(relative, ignore_patterns):
+                        files.add(relative)
+        files.add("Dockerfile")
+        
+        context = io.BytesIO()
+        with tarfile.open(fileobj=context, mode="w") as tar:
+            for relative in sorted(files):
+                tar.add(context_dir / relative, arcname=relative, recursive=False)
+        context.seek(0)
+        return context, len(files)
+    
+    def _dockerfile_sources(self, dockerfile: str) -> list:
+        """Collect local COPY/ADD sources from a Dockerfile"""
+        sources = []
+        for line in dockerfile.replace("\\\n", " ").splitlines():
+            parts = line.strip().split()
+            if len(parts) < 3 or parts[0].upper() not in ("COPY", "ADD"):
+                continue
+            if any(arg.startswith("--from") for arg in parts[1:]):
+                continue
+            args = [arg for arg in parts[1:] if not arg.startswith("--")]
+            if args and args[0].startswith("["):
+                args = json.loads(" ".join(args))
+            sources.extend(arg for arg in args[:-1] if "://" not in arg)
+        return sources
+    
+    def _read_dockerignore(self, context_dir: Path) -> list:
+        ignore_file = context_dir / ".dockerignore"
+        if not ignore_file.exists():
+            return []
+        patterns = []
+        for line in ignore_file.read_text().splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                patterns.append(line)
+        return patterns
+    
+    def _is_dockerignored(self, relative_path: str, patterns: list) -> bool:
+        """Apply .dockerignore rules in order; later `!` patterns re-include paths"""
+        ignored = False
+        parts = relative_path.split("/")
+        prefixes = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+        for pattern in patterns:
+            negate = pattern.startswith("!")
+            pattern = pattern.lstrip("!").strip("/")
+            if any(fnmatch.fnmatch(prefix, pattern) for prefix in prefixes):
+                ignored = not negate
+        return ignored
+    
     def push_image(self, image_name: str, tag: str = "latest", registry: Optional[str] = None) -> bool:
         """Push image to registry"""
         try:
@@ -106,12 +251,22 @@ class DockerService:
             return False
     
     def scan_image(self, image_name: str, tag: str = "latest") -> dict:
-        """Scan image for vulnerabilities using Trivy"""
+        """Scan image for vulnerabilities using Trivy, reusing cached reports"""
         if not settings.TRIVY_ENABLED:
             return {"vulnerabilities": [], "scan_enabled": False}
         
         try:
             full_name = f"{image_name}:{tag}"
+            digest = self._get_image_digest(full_name)
+            db_version = self._get_trivy_db_version()
+            
+            if digest and db_version:
+                cached = self._load_cached_report(digest, db_version)
+                if cached is not None:
+                    logger.info(f"Using cached scan for {full_name} ({digest[:19]})")
+                    self._remember_summary(full_name, digest, db_version)
+                    return cached
+            
             result = subprocess.run(
                 ["trivy", "image", "--format", "json", full_name],
                 capture_output=True,
@@ -119,8 +274,13 @@ class DockerService:
             )
             
             if result.returncode == 0:
-                import json
-                return json.loads(result.stdout)
+                report = json.loads(result.stdout)
+                digest = digest or report.get("Metadata", {}).get("ImageID")
+                # Trivy may have refreshed its DB during the scan
+                db_version = self._get_trivy_db_version(refresh=True) or db_version
+                if digest and db_version:
+                    self._store_report(full_name, digest, db_version, result.stdout, report)
+                return report
             else:
                 logger.warning("Trivy scan failed or not installed")
                 return {"vulnerabilities": [], "scan_enabled": False}
@@ -130,6 +290,185 @@ class DockerService:
         except Exception as e:
             logger.error(f"Failed to scan image: {e}")
             return {"vulnerabilities": [], "error": str(e)}
+    
+    def submit_scan(self, image_name: str, tag: str = "latest") -> str:
+        """Queue an image scan on the worker pool and return its job id"""
+        full_name = f"{image_name}:{tag}"
+        with self._scan_lock:
+            # Collapse repeated submissions for an image that is already being scanned
+            for job in self.scan_jobs.values():
+                if job["image"] == full_name and job["status"] in ("queued", "running"):
+                    return job["job_id"]
+            
+            job_id = str(uuid.uuid4())
+            self.scan_jobs[job_id] = {
+                "job_id": job_id,
+                "image": full_name,
+                "status": "queued",
+                "submitted_at": datetime.utcnow().isoformat(),
+                "completed_at": None,
+                "summary": None,
+                "error": None
+            }
+            self._prune_scan_jobs()
+        
+        self.scan_executor.submit(self._run_scan_job, job_id, image_name, tag)
+        return job_id
+    
+    def get_scan_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the status of a queued scan"""
+        with self._scan_lock:
+            job = self.scan_jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def get_scan_summary(self, image_name: str, tag: str = "latest") -> Optional[Dict[str, Any]]:
+        """Get vulnerability counts from the latest scan without loading the full report"""
+        full_name = f"{image_name}:{tag}"
+        digest = self._get_image_digest(full_name)
+        db_version = self._get_trivy_db_version()
+        if not digest or not db_version:
+            return None
+        
+        with self._scan_lock:
+            summary = self.scan_summaries.get(f"{digest}|{db_version}")
+        if summary is not None:
+            return dict(summary, image=full_name)
+        return self._remember_summary(full_name, digest, db_version)
+    
+    def _run_scan_job(self, job_id: str, image_name: str, tag: str):
+        """Execute a queued scan and record its outcome"""
+        self._update_scan_job(job_id, status="running")
+        try:
+            report = self.scan_image(image_name, tag)
+            if report.get("error") or report.get("scan_enabled") is False:
+                self._update_scan_job(
+                    job_id,
+                    status="failed",
+                    error=report.get("error", "Scan unavailable"),
+                    completed_at=datetime.utcnow().isoformat()
+                )
+                return
+            self._update_scan_job(
+                job_id,
+                status="completed",
+                summary=self.get_scan_summary(image_name, tag),
+                completed_at=datetime.utcnow().isoformat()
+            )
+        except Exception as e:
+            logger.error(f"Scan job {job_id} failed: {e}")
+            self._update_scan_job(
+                job_id,
+                status="failed",
+                error=str(e),
+                completed_at=datetime.utcnow().isoformat()
+            )
+    
+    def _update_scan_job(self, job_id: str, **fields):
+        with self._scan_lock:
+            if job_id in self.scan_jobs:
+                self.scan_jobs[job_id].update(fields)
+    
+    def _prune_scan_jobs(self):
+        """Drop the oldest finished jobs once the job table is full"""
+        finished = [
+            job_id for job_id, job in self.scan_jobs.items()
+            if job["status"] in ("completed", "failed")
+        ]
+        excess = len(self.scan_jobs) - MAX_SCAN_JOBS
+        for job_id in finished[:max(excess, 0)]:
+            del self.scan_jobs[job_id]
+    
+    def _get_image_digest(self, full_name: str) -> Optional[str]:
+        """Resolve the content digest (image ID) of a local image"""
+        try:
+            if self.client:
+                return self.client.images.get(full_name).id
+            result = subprocess.run(
+                ["docker", "image", "inspect", "--format", "{{.Id}}", full_name],
+                capture_output=True,
+                text=True
+            )
+            return result.stdout.strip() if result.returncode == 0 else None
+        except Exception as e:
+            logger.debug(f"Could not resolve digest for {full_name}: {e}")
+            return None
+    
+    def _get_trivy_db_version(self, refresh: bool = False) -> Optional[str]:
+        """Get the vulnerability DB timestamp, cached for a few minutes"""
+        now = time.monotonic()
+        if not refresh and self._trivy_db_version and now - self._trivy_db_checked_at < TRIVY_DB_VERSION_TTL:
+            return self._trivy_db_version
+        
+        try:
+            result = subprocess.run(
+                ["trivy", "version", "--format", "json"],
+                capture_output=True,
+                text=True
+            )
+            if result.returncode != 0:
+                return None
+            db = json.loads(result.stdout).get("VulnerabilityDB") or {}
+            version = db.get("UpdatedAt")
+            if version:
+                self._trivy_db_version = f"v{db.get('Version', 0)}-{version}"
+                self._trivy_db_checked_at = now
+            return self._trivy_db_version
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def _scan_cache_path(self, digest: str, db_version: str) -> Path:
+        digest_key = digest.split(":", 1)[-1]
+        db_key = re.sub(r"[^A-Za-z0-9._-]", "_", db_version)
+        return self.scan_cache_dir / digest_key / db_key
+    
+    def _load_cached_report(self, digest: str, db_version: str) -> Optional[dict]:
+        report_file = self._scan_cache_path(digest, db_version) / "report.json"
+        if not report_file.exists():
+            return None
+        try:
+            return json.loads(report_file.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable scan cache entry {report_file}: {e}")
+            return None
+    
+    def _store_report(self, full_name: str, digest: str, db_version: str, raw_report: str, report: dict):
+        """Persist the full report and its compact summary"""
+        cache_path = self._scan_cache_path(digest, db_version)
+        try:
+            cache_path.mkdir(parents=True, exist_ok=True)
+            summary = self._summarize_report(report, digest, db_version)
+            (cache_path / "report.json").write_text(raw_report)
+            (cache_path / "summary.json").write_text(json.dumps(summary))
+            with self._scan_lock:
+                self.scan_summaries[f"{digest}|{db_version}"] = summary
+        except OSError as e:
+            logger.warning(f"Failed to cache scan report for {full_name}: {e}")
+    
+    def _remember_summary(self, full_name: str, digest: str, db_version: str) -> Optional[Dict[str, Any]]:
+        summary_file = self._scan_cache_path(digest, db_version) / "summary.json"
+        try:
+            summary = json.loads(summary_file.read_text())
+        except (OSError, ValueError):
+            return None
+        with self._scan_lock:
+            self.scan_summaries[f"{digest}|{db_version}"] = summary
+        return dict(summary, image=full_name)
+    
+    def _summarize_report(self, report: dict, digest: str, db_version: str) -> Dict[str, Any]:
+        """Reduce a Trivy report to per-severity vulnerability counts"""
+        counts = {severity: 0 for severity in SEVERITIES}
+        for target in report.get("Results") or []:
+            for vulnerability in target.get("Vulnerabilities") or []:
+                severity = vulnerability.get("Severity", "UNKNOWN")
+                counts[severity] = counts.get(severity, 0) + 1
+        
+        return {
+            "digest": digest,
+            "db_version": db_version,
+            "severity_counts": counts,
+            "total": sum(counts.values()),
+            "scanned_at": datetime.utcnow().isoformat()
+        }
 
 
 docker_service = DockerService()
\ No newline at end of file
@@ -21,7 +21,6 @@ class LLMService:
 
 llm_service = LLMService()
 
-from openai import OpenAI
 from app.config import settings
 from typing import Dict, Any
 import json
@@ -29,15 +28,24 @@ import json
 
 class LLMService:
     def __init__(self):
-        if settings.DEFAULT_LLM_PROVIDER == "groq":
-            self.client = OpenAI(
-                api_key=settings.GROQ_API_KEY,
-                base_url="https://api.groq.com/openai/v1",
-            )
-        elif settings.DEFAULT_LLM_PROVIDER == "openai" and settings.OPENAI_API_KEY:
-            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        else:
-            raise ValueError("No valid LLM provider configured")
+        self._client = None
+    
+    @property
+    def client(self):
+        """LLM client, created on first use so startup needs neither openai nor an API key"""
+        if self._client is None:
+            # openai takes most of the application's import time
+            from openai import OpenAI
+            if settings.DEFAULT_LLM_PROVIDER == "groq" and settings.GROQ_API_KEY:
+                self._client = OpenAI(
+                    api_key=settings.GROQ_API_KEY,
+                    base_url="https://api.groq.com/openai/v1",
+                )
+            elif settings.DEFAULT_LLM_PROVIDER == "openai" and settings.OPENAI_API_KEY:
+                self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            else:
+                raise ValueError("No valid LLM provider configured")
+        return self._client
     
     def generate_completion(self, prompt: str, system_prompt: str = None, **kwargs) -> str:
         """Generate a completion using the configured LLM with a custom system prompt"""
@@ -0,0 +1,167 @@
+from pymongo.asynchronous.database import AsyncDatabase
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+from time import perf_counter
+from app.config import settings
+from app.services.request_metrics_service import request_metrics_service
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Above this fill ratio only every SAMPLE_EVERY-th event is kept
+PRESSURE_RATIO = 0.8
+SAMPLE_EVERY = 10
+# A batch that fails this many flushes in a row is dropped so it cannot stall the buffer
+MAX_FLUSH_ATTEMPTS = 5
+
+
+class MetricsWriteBuffer:
+    """
+    Bounded buffer of request-metric events written to MongoDB in batches.
+    
+    A flush happens whenever batch_size events are waiting or flush_interval
+    seconds have passed. Once the buffer is mostly full new events are sampled,
+    and when it is full they are dropped, so a slow database can never grow
+    memory without bound or stall request handling.
+    
+    A failed batch is held aside with a record of what was already written and
+    retried before any new batch, so a retry never stores an event twice.
+    """
+    
+    def __init__(self, max_events: int, batch_size: int, flush_interval: float):
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.events: deque = deque()
+        self.dropped = 0
+        self.sampled_out = 0
+        self.flushed = 0
+        self.flush_failures = 0
+        self.flush_count = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self._sample_counter = 0
+        # Failed batch awaiting retry: (events, ingest progress, attempts so far)
+        self._retry: Optional[Tuple[List[Dict[str, Any]], Dict[str, Any], int]] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._db: Optional[AsyncDatabase] = None
+    
+    def add(self, event: Dict[str, Any]):
+        """Queue one event; never blocks"""
+        size = self.pending()
+        if size >= self.max_events:
+            self.dropped += 1
+            return
+        if size >= self.max_events * PRESSURE_RATIO:
+            self._sample_counter += 1
+            if self._sample_counter % SAMPLE_EVERY:
+                self.sampled_out += 1
+                return
+        self.events.append(event)
+        if size + 1 >= self.batch_size:
+            self._ready.set()
+    
+    def pending(self) -> int:
+        """Events waiting to be written, including a batch held for retry"""
+        return len(self.events) + (len(self._retry[0]) if self._retry else 0)
+    
+    def start(self, db: AsyncDatabase):
+        self._db = db
+        self._task = asyncio.create_task(self._run())
+    
+    async def close(self):
+        """Stop the flush loop and write out everything still buffered"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db is None:
+            return
+        while self.pending():
+            if not await self.flush():
+                logger.warning(f"Discarding {self.pending()} request metric events on shutdown")
+                self.dropped += self.pending()
+                self.events.clear()
+                self._retry = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            while self.pending():
+                if not await self.flush() or len(self.events) < self.batch_size:
+                    break
+    
+    async def flush(self) -> bool:
+        """Write one batch, retrying a previously failed one first"""
+        if self._retry:
+            batch, progress, attempts = self._retry
+            self._retry = None
+        else:
+            batch, progress, attempts = [], {}, 0
+            while self.events and len(batch) < self.batch_size:
+                batch.append(self.events.popleft())
+        if not batch:
+            return True
+        
+        started = perf_counter()
+        try:
+            await request_metrics_service.ingest(self._db, batch, progress)
+        except Exception as e:
+            self.flush_failures += 1
+            attempts += 1
+            if attempts >= MAX_FLUSH_ATTEMPTS:
+                logger.error(f"Dropping {len(batch)} request metric events after {attempts} failed flushes: {e}")
+                self.dropped += len(batch)
+            else:
+                self._retry = (batch, progress, attempts)
+                logger.warning(f"Request metrics flush failed: {e}")
+            return False
+        finally:
+            elapsed = perf_counter() - started
+            self.flush_count += 1
+            self.flush_seconds_total += elapsed
+            self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+        
+        self.flushed += len(batch)
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": self.pending(),
+            "max_events": self.max_events,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "flush_failures": self.flush_failures,
+            "flushes": self.flush_count,
+            "flush_seconds_avg": self.flush_seconds_total / self.flush_count if self.flush_count else 0.0,
+            "flush_seconds_max": self.flush_seconds_max
+        }
+    
+    def snapshot(self) -> Dict[str, float]:
+        """Counters keyed by their Prometheus names, summed across workers"""
+        return {
+            "events": self.pending(),
+            "flushed_total": self.flushed,
+            "dropped_total": self.dropped,
+            "sampled_out_total": self.sampled_out,
+            "flush_failures_total": self.flush_failures,
+            "flush_seconds_sum": self.flush_seconds_total,
+            "flush_seconds_count": self.flush_count
+        }
+
+
+metrics_buffer = MetricsWriteBuffer(
+    max_events=settings.METRICS_BUFFER_MAX_EVENTS,
+    batch_size=settings.METRICS_BUFFER_BATCH_SIZE,
+    flush_interval=settings.METRICS_BUFFER_FLUSH_SECONDS
+)
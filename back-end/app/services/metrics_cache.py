@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from app.config import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+BucketRows = List[Dict[str, Any]]
+
+
+class ChartBucketCache:
+    """
+    Cache for time-bucketed chart series.
+    
+    Buckets that closed more than a grace period ago never change again, so
+    they are kept (LRU-bounded) and only the still-open tail of a chart is
+    queried. Identical concurrent queries share one database round trip.
+    """
+    
+    def __init__(self, max_buckets: int, grace: timedelta):
+        self.max_buckets = max_buckets
+        self.grace = grace
+        self.hits = 0
+        self.misses = 0
+        self._buckets: "OrderedDict[Tuple[str, datetime], Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, datetime, datetime], asyncio.Future] = {}
+    
+    async def get_series(self, interval: str, first_bucket: datetime, last_bucket: datetime,
+                         delta: timedelta, now: datetime,
+                         query: Callable[[datetime], Awaitable[BucketRows]]) -> BucketRows:
+        """
+        Return one row per bucket from first_bucket to last_bucket.
+        
+        query(start) must return rows for every bucket from start to last_bucket.
+        """
+        buckets = []
+        bucket = first_bucket
+        while bucket <= last_bucket:
+            buckets.append(bucket)
+            bucket += delta
+        
+        # Serve the leading run of closed, cached buckets; query everything after it
+        closed_before = now - self.grace
+        cached = []
+        for bucket in buckets:
+            row = self._buckets.get((interval, bucket))
+            if row is None or bucket + delta > closed_before:
+                break
+            self._buckets.move_to_end((interval, bucket))
+            cached.append(row)
+        
+        self.hits += len(cached)
+        if len(cached) == len(buckets):
+            return cached
+        self.misses += len(buckets) - len(cached)
+        
+        query_start = buckets[len(cached)]
+        rows = await self._single_flight((interval, query_start, last_bucket), lambda: query(query_start))
+        fresh = {row["bucket"]: row for row in rows}
+        for bucket, row in fresh.items():
+            if bucket + delta <= closed_before:
+                self._store((interval, bucket), row)
+        
+        return cached + [
+            fresh.get(bucket) or {"bucket": bucket, "count": 0, "errors": 0}
+            for bucket in buckets[len(cached):]
+        ]
+    
+    async def _single_flight(self, key: Tuple[str, datetime, datetime],
+                             query: Callable[[], Awaitable[BucketRows]]) -> BucketRows:
+        """Run query once for all callers waiting on the same key"""
+        task = self._inflight.get(key)
+        if task is None:
+            # The query belongs to the cache, not to the first caller, so a
+            # cancelled request does not cancel it for the others
+            task = asyncio.ensure_future(query())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._query_done(key, done))
+        return await asyncio.shield(task)
+    
+    def _query_done(self, key: Tuple[str, datetime, datetime], task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
+    
+    def _store(self, key: Tuple[str, datetime], row: Dict[str, Any]):
+        self._buckets[key] = row
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_buckets": len(self._buckets),
+            "max_buckets": self.max_buckets,
+            "bucket_hits": self.hits,
+            "bucket_misses": self.misses,
+            "inflight_queries": len(self._inflight)
+        }
+
+
+chart_cache = ChartBucketCache(
+    max_buckets=settings.METRICS_CACHE_MAX_BUCKETS,
+    grace=timedelta(seconds=settings.METRICS_CACHE_GRACE_SECONDS)
+)
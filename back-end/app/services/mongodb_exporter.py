@@ -9,96 +9,126 @@ class MongoDBExporter:
         return
 
 # app/services/mongodb_exporter.py
-from prometheus_client import start_http_server, Gauge, Counter
-import pymongo
-import time
+from prometheus_client import start_http_server, Gauge, Counter, Histogram
+from pymongo.asynchronous.database import AsyncDatabase
+from pathlib import Path
+import asyncio
+import fcntl
 import logging
-from datetime import datetime
+import os
+from datetime import datetime, timedelta
+from app.services.request_metrics_service import LATENCY_BUCKETS
 
 logger = logging.getLogger(__name__)
 
+# Events are read by the time their insert started, not by when they happened, so
+# buffered and retried events are still seen. This lag must exceed one insert's
+# worst case: the 5 s server selection, 2 s pool wait and 30 s socket timeouts.
+COLLECTION_LAG = timedelta(seconds=60)
+
+# Registered once per process; an exporter created by a later lifespan run updates the same series
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Total HTTP requests',
+    ['method', 'endpoint', 'status']
+)
+
+RESPONSE_TIME = Histogram(
+    'http_response_time_seconds',
+    'HTTP response time in seconds',
+    ['endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+
+ERROR_COUNT = Counter(
+    'http_errors_total',
+    'Total HTTP errors',
+    ['endpoint', 'status_code']
+)
+
+ACTIVE_DEPLOYMENTS = Gauge(
+    'active_deployments',
+    'Number of active deployments'
+)
+
 class MongoDBExporter:
-    def __init__(self, mongo_uri, db_name='metrics', port=8001):
-        self.mongo_uri = mongo_uri
-        self.db_name = db_name
+    def __init__(self, db: AsyncDatabase, port=8001):
+        self.db = db
         self.port = port
-        
-        # Define Prometheus metrics
-        self.request_count = Counter(
-            'http_requests_total',
-            'Total HTTP requests',
-            ['method', 'endpoint', 'status']
-        )
-        
-        self.response_time = Gauge(
-            'http_response_time_seconds',
-            'HTTP response time in seconds',
-            ['endpoint']
-        )
-        
-        self.error_count = Counter(
-            'http_errors_total',
-            'Total HTTP errors',
-            ['endpoint', 'status_code']
-        )
-        
-        self.active_deployments = Gauge(
-            'active_deployments',
-            'Number of active deployments'
-        )
-        
-        self.client = None
-        self.db = None
-        
-    def connect(self):
-        """Connect to MongoDB"""
-        try:
-            self.client = pymongo.MongoClient(self.mongo_uri)
-            self.db = self.client[self.db_name]
-            logger.info("Connected to MongoDB")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to MongoDB: {e}")
-            return False
+        # Upper bound of the ingested_at window already folded into the metrics
+        self.high_water_mark = None
     
-    def collect_metrics(self):
-        """Collect metrics from MongoDB and update Prometheus metrics"""
-        if self.db is None:
-            self.connect()
-            if self.db is None:
-                return
-                
+    async def setup(self):
+        """Start counting from now and index the fields each cycle filters on"""
+        self.high_water_mark = datetime.utcnow() - COLLECTION_LAG
+        await self.db.deployments.create_index("status")
+    
+    async def collect_metrics(self):
+        """Fold request events recorded since the last cycle into the Prometheus metrics"""
         try:
-            # Get request counts by endpoint
-            pipeline = [
-                {"$group": {
-                    "_id": {"endpoint": "$endpoint", "status": "$status"},
-                    "count": {"$sum": 1}
-                }}
-            ]
+            if self.high_water_mark is None:
+                await self.setup()
             
-            results = list(self.db.request_metrics.aggregate(pipeline))
-            for result in results:
-                self.request_count.labels(
-                    method=result['_id'].get('method', 'unknown'),
-                    endpoint=result['_id']['endpoint'],
-                    status=result['_id']['status']
-                ).set(result['count'])
+            # Only the window since the last cycle is read, via the ingested_at index
+            window_end = datetime.utcnow() - COLLECTION_LAG
+            cursor = self.db.request_metrics.find(
+                {"ingested_at": {"$gt": self.high_water_mark, "$lte": window_end}},
+                projection={"_id": 0, "method": 1, "endpoint": 1, "status": 1, "duration": 1}
+            )
+            # Read the whole window before touching the counters, so a failed read can be retried
+            events = await cursor.to_list()
+            for event in events:
+                endpoint = event.get('endpoint', 'unknown')
+                status = event.get('status', 0)
+                REQUEST_COUNT.labels(
+                    method=event.get('method', 'unknown'),
+                    endpoint=endpoint,
+                    status=status
+                ).inc()
+                if status >= 400:
+                    ERROR_COUNT.labels(endpoint=endpoint, status_code=status).inc()
+                if event.get('duration') is not None:
+                    RESPONSE_TIME.labels(endpoint=endpoint).observe(event['duration'])
+            self.high_water_mark = window_end
+            logger.debug(f"Exported {len(events)} new request events")
             
-            # Get active deployments count
-            active_count = self.db.deployments.count_documents({
+            # Indexed count over deployments that are running now, not all history
+            active_count = await self.db.deployments.count_documents({
                 "status": "running"
             })
-            self.active_deployments.set(active_count)
+            ACTIVE_DEPLOYMENTS.set(active_count)
             
         except Exception as e:
             logger.error(f"Error collecting metrics: {e}")
     
-    def run(self):
+    async def run(self):
         """Start the metrics server and collection loop"""
         start_http_server(self.port)
         logger.info(f"Prometheus metrics server started on port {self.port}")
         
         while True:
-            self.collect_metrics()
-            time.sleep(15)  # Collect metrics every 15 seconds
\ No newline at end of file
+            await self.collect_metrics()
+            await asyncio.sleep(15)  # Collect metrics every 15 seconds
+    
+    async def run_when_elected(self, lock_path: str, retry_seconds: float = 30):
+        """
+        Run the exporter in exactly one worker per pod.
+        
+        Workers compete for an exclusive lock on a shared file. The winner binds
+        the metrics port and holds the lock until it exits; another worker then
+        takes over on its next attempt.
+        """
+        Path(lock_path).parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(lock_path, "w")
+        try:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(retry_seconds)
+            logger.info(f"Worker {os.getpid()} runs the metrics exporter for this pod")
+            await self.run()
+        finally:
+            # Closing the file releases the lock
+            lock_file.close()
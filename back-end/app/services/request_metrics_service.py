@@ -0,0 +1,316 @@
+from pymongo import UpdateOne, ASCENDING
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson import ObjectId
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from app.config import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+RAW_COLLECTION = "request_metrics"
+
+# Rollup collections from finest to coarsest, with bucket width and $dateTrunc unit
+ROLLUPS = [
+    ("request_metrics_1m", timedelta(minutes=1), "minute"),
+    ("request_metrics_1h", timedelta(hours=1), "hour"),
+]
+
+# Hourly per-deployment buckets produced from raw events before they expire
+DOWNSAMPLED_COLLECTION = "deployment_request_metrics_1h"
+JOBS_COLLECTION = "metrics_jobs"
+
+# Raw events may arrive this late (write buffer, agent reporting) before an hour is downsampled
+DOWNSAMPLE_GRACE = timedelta(minutes=5)
+
+# Upper bounds (seconds) of the latency histogram kept in every rollup bucket
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+def latency_bucket_key(duration: float) -> str:
+    """Histogram field name for a request duration, e.g. le_250ms"""
+    for bound in LATENCY_BUCKETS:
+        if duration <= bound:
+            return f"le_{int(bound * 1000)}ms"
+    return "le_inf"
+
+
+def truncate(moment: datetime, width: timedelta) -> datetime:
+    """Start of the rollup bucket containing moment"""
+    return datetime.min + ((moment - datetime.min) // width) * width
+
+
+def histogram_accumulators() -> Dict[str, Any]:
+    """$group accumulators counting durations per latency bucket, as hist_le_* fields"""
+    # $group cannot output dotted names, so callers nest these afterwards
+    return {
+        f"hist_{latency_bucket_key(upper)}": {"$sum": {"$cond": [
+            {"$and": [{"$gt": ["$duration", lower]}, {"$lte": ["$duration", upper]}]}, 1, 0
+        ]}}
+        for lower, upper in zip([float("-inf")] + LATENCY_BUCKETS, LATENCY_BUCKETS + [float("inf")])
+    }
+
+
+def retention_seconds() -> Dict[str, int]:
+    """TTL per collection; raw events are kept shortest, coarse buckets longest"""
+    day = 86400
+    return {
+        RAW_COLLECTION: settings.METRICS_RAW_RETENTION_DAYS * day,
+        "request_metrics_1m": settings.METRICS_MINUTE_RETENTION_DAYS * day,
+        "request_metrics_1h": settings.METRICS_HOUR_RETENTION_DAYS * day,
+        DOWNSAMPLED_COLLECTION: settings.METRICS_DOWNSAMPLED_RETENTION_DAYS * day,
+    }
+
+
+class RequestMetricsService:
+    """Ingests request events and keeps pre-aggregated rollups up to date"""
+    
+    async def ensure_collections(self, db: AsyncDatabase):
+        """
+        Store raw events in a time-series collection and put TTLs on every
+        metrics collection so storage stops growing without bound.
+        """
+        retention = retention_seconds()
+        cursor = await db.list_collections(filter={"name": RAW_COLLECTION})
+        existing = await cursor.to_list()
+        
+        if not existing:
+            await db.create_collection(
+                RAW_COLLECTION,
+                timeseries={"timeField": "timestamp", "metaField": "deployment_id", "granularity": "seconds"},
+                expireAfterSeconds=retention[RAW_COLLECTION]
+            )
+        elif existing[0].get("type") == "timeseries":
+            await db.command("collMod", RAW_COLLECTION, expireAfterSeconds=retention[RAW_COLLECTION])
+        else:
+            # Pre time-series deployments keep working with a TTL index until migrated
+            logger.warning(f"{RAW_COLLECTION} is not a time-series collection; run migrate_raw_collection")
+            await self._ensure_ttl_index(db, RAW_COLLECTION, retention[RAW_COLLECTION])
+        
+        # Lets the chart aggregation be answered from the index alone
+        await db[RAW_COLLECTION].create_index([("timestamp", ASCENDING), ("status", ASCENDING)])
+        # The Prometheus exporter reads new events by insert time
+        await db[RAW_COLLECTION].create_index([("ingested_at", ASCENDING)])
+        
+        for collection in [name for name, _, _ in ROLLUPS] + [DOWNSAMPLED_COLLECTION]:
+            await self._ensure_ttl_index(db, collection, retention[collection])
+        await db[DOWNSAMPLED_COLLECTION].create_index([("deployment_id", ASCENDING), ("timestamp", ASCENDING)])
+    
+    async def _ensure_ttl_index(self, db: AsyncDatabase, collection: str, seconds: int):
+        try:
+            await db[collection].create_index([("timestamp", ASCENDING)], expireAfterSeconds=seconds)
+        except OperationFailure as e:
+            # IndexOptionsConflict: the index exists without a TTL or with another one
+            if e.code != 85:
+                raise
+            await db.command("collMod", collection, index={
+                "keyPattern": {"timestamp": 1}, "expireAfterSeconds": seconds
+            })
+    
+    async def migrate_raw_collection(self, db: AsyncDatabase, batch_size: int = 10000):
+        """Move a plain request_metrics collection into a time-series one, keeping retained events"""
+        legacy = f"{RAW_COLLECTION}_legacy"
+        await db[RAW_COLLECTION].rename(legacy)
+        await self.ensure_collections(db)
+        
+        cutoff = datetime.utcnow() - timedelta(seconds=retention_seconds()[RAW_COLLECTION])
+        cursor = db[legacy].find({"timestamp": {"$gte": cutoff}}, {"_id": 0}).batch_size(batch_size)
+        batch = []
+        moved = 0
+        async for event in cursor:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                await db[RAW_COLLECTION].insert_many(batch, ordered=False)
+                moved += len(batch)
+                batch = []
+        if batch:
+            await db[RAW_COLLECTION].insert_many(batch, ordered=False)
+            moved += len(batch)
+        
+        await db[legacy].drop()
+        logger.info(f"Migrated {moved} events into time-series collection {RAW_COLLECTION}")
+    
+    async def ingest(self, db: AsyncDatabase, events: List[Dict[str, Any]],
+                     progress: Optional[Dict[str, Any]] = None):
+        """
+        Store raw events and fold them into every rollup with upserts.
+        
+        `progress` records what has been written so far. Retrying a failed
+        call with the same dict and events skips the finished stages, so
+        events are not stored or counted twice.
+        """
+        if not events:
+            return
+        if progress is None:
+            progress = {}
+        done = progress.setdefault("done", set())
+        
+        if RAW_COLLECTION not in done:
+            # Time-series collections do not enforce a unique _id, so a retry
+            # skips the events an earlier attempt already stored, found by the
+            # ids given to them here rather than by the server
+            for event in events:
+                event.setdefault("_id", ObjectId())
+            unstored = events
+            if "attempted_at" in progress:
+                cursor = db[RAW_COLLECTION].find(
+                    {"ingested_at": {"$gte": progress["attempted_at"]}, "_id": {"$in": [event["_id"] for event in events]}},
+                    {"_id": 1}
+                )
+                stored = {doc["_id"] for doc in await cursor.to_list()}
+                unstored = [event for event in events if event["_id"] not in stored]
+            
+            # Stamped per attempt, so readers can follow inserts in the order they land
+            ingested_at = datetime.utcnow()
+            progress.setdefault("attempted_at", ingested_at)
+            for event in unstored:
+                event["ingested_at"] = ingested_at
+            if unstored:
+                await db[RAW_COLLECTION].insert_many(unstored, ordered=False)
+            done.add(RAW_COLLECTION)
+        
+        for collection, width, _ in ROLLUPS:
+            if collection in done:
+                continue
+            increments: Dict[datetime, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+            for event in events:
+                bucket = increments[truncate(event["timestamp"], width)]
+                bucket["count"] += 1
+                bucket["errors"] += 1 if event.get("status", 200) >= 400 else 0
+                bucket["latency_sum"] += event.get("duration", 0.0)
+                bucket[f"latency_hist.{latency_bucket_key(event.get('duration', 0.0))}"] += 1
+            
+            # Only the buckets a previous attempt could not update are retried
+            pending = progress.get(collection)
+            if pending is not None:
+                increments = {bucket_start: increments[bucket_start] for bucket_start in pending}
+            
+            # One upsert per touched bucket, not per event
+            bucket_starts = list(increments)
+            operations = [
+                UpdateOne(
+                    {"_id": bucket_start},
+                    {"$inc": dict(increments[bucket_start]), "$setOnInsert": {"timestamp": bucket_start}},
+                    upsert=True
+                )
+                for bucket_start in bucket_starts
+            ]
+            try:
+                await db[collection].bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                progress[collection] = [bucket_starts[error["index"]] for error in e.details.get("writeErrors", [])]
+                raise
+            progress.pop(collection, None)
+            done.add(collection)
+    
+    async def rebuild_rollups(self, db: AsyncDatabase, start: datetime, end: datetime):
+        """Recompute rollups for a time window from raw events, e.g. after a backfill"""
+        histogram = histogram_accumulators()
+        for collection, width, unit in ROLLUPS:
+            cursor = await db[RAW_COLLECTION].aggregate([
+                {"$match": {"timestamp": {"$gte": truncate(start, width), "$lt": end}}},
+                {"$group": {
+                    "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit}},
+                    "count": {"$sum": 1},
+                    "errors": {"$sum": {"$cond": [{"$gte": ["$status", 400]}, 1, 0]}},
+                    "latency_sum": {"$sum": "$duration"},
+                    **histogram
+                }},
+                {"$project": {
+                    "timestamp": "$_id",
+                    "count": 1,
+                    "errors": 1,
+                    "latency_sum": 1,
+                    "latency_hist": {key[len("hist_"):]: f"${key}" for key in histogram}
+                }},
+                {"$merge": {"into": collection, "whenMatched": "replace", "whenNotMatched": "insert"}}
+            ])
+            await cursor.to_list()
+            logger.info(f"Rebuilt {collection} from {start} to {end}")
+    
+    async def downsample(self, db: AsyncDatabase, now: datetime):
+        """
+        Fold closed hours of raw events into per-deployment hourly buckets.
+        
+        Progress is kept as a high-water mark, and buckets are replaced rather
+        than incremented, so concurrent or repeated runs are harmless.
+        """
+        job = await db[JOBS_COLLECTION].find_one({"_id": "downsample"})
+        end = truncate(now - DOWNSAMPLE_GRACE, timedelta(hours=1))
+        if job:
+            start = job["high_water_mark"]
+        else:
+            start = truncate(now - timedelta(seconds=retention_seconds()[RAW_COLLECTION]), timedelta(hours=1))
+        if end <= start:
+            return
+        
+        histogram = histogram_accumulators()
+        cursor = await db[RAW_COLLECTION].aggregate([
+            # Platform API requests carry no deployment_id and are covered by the global rollups
+            {"$match": {"timestamp": {"$gte": start, "$lt": end}, "deployment_id": {"$ne": None}}},
+            {"$group": {
+                "_id": {
+                    "deployment_id": "$deployment_id",
+                    "timestamp": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}
+                },
+                "request_count": {"$sum": 1},
+                "error_count": {"$sum": {"$cond": [{"$gte": ["$status", 400]}, 1, 0]}},
+                "total_response_time": {"$sum": "$duration"},
+                **histogram
+            }},
+            {"$project": {
+                "_id": {"$concat": [
+                    "$_id.deployment_id", ":", {"$dateToString": {"date": "$_id.timestamp"}}
+                ]},
+                "deployment_id": "$_id.deployment_id",
+                "timestamp": "$_id.timestamp",
+                "request_count": 1,
+                "error_count": 1,
+                "total_response_time": 1,
+                "avg_response_time": {"$divide": ["$total_response_time", "$request_count"]},
+                "latency_hist": {key[len("hist_"):]: f"${key}" for key in histogram}
+            }},
+            {"$merge": {"into": DOWNSAMPLED_COLLECTION, "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ])
+        await cursor.to_list()
+        
+        await db[JOBS_COLLECTION].update_one(
+            {"_id": "downsample"}, {"$set": {"high_water_mark": end}}, upsert=True
+        )
+        logger.info(f"Downsampled request metrics from {start} to {end}")
+    
+    async def run_downsampling(self, db: AsyncDatabase):
+        """Downsample on a schedule for the lifetime of the application"""
+        while True:
+            try:
+                await self.downsample(db, datetime.utcnow())
+            except Exception as e:
+                logger.warning(f"Request metrics downsampling failed: {e}")
+            await asyncio.sleep(settings.METRICS_DOWNSAMPLE_INTERVAL_SECONDS)
+
+
+def choose_rollup(interval: timedelta) -> Optional[str]:
+    """Coarsest rollup whose buckets evenly divide the requested interval"""
+    for collection, width, _ in reversed(ROLLUPS):
+        if interval >= width and interval % width == timedelta(0):
+            return collection
+    return None
+
+
+request_metrics_service = RequestMetricsService()
+
+
+if __name__ == "__main__":
+    # python -m app.services.request_metrics_service migrate
+    import sys
+    from app.database import database
+    
+    async def migrate():
+        await request_metrics_service.migrate_raw_collection(database.get_db())
+        await database.close()
+    
+    if sys.argv[1:] == ["migrate"]:
+        asyncio.run(migrate())
@@ -0,0 +1,231 @@
+from pymongo import ASCENDING
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import ConnectionFailure
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import settings
+from app.schemas import AgentTemplate, AgentType
+import asyncio
+import hashlib
+import logging
+import orjson
+import time
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_COLLECTION = "agent_templates"
+META_COLLECTION = "catalog_meta"
+CATALOG_ID = "agent_templates"
+
+
+class TemplateConflictError(Exception):
+    """A different template is already stored under the same id"""
+
+
+# Built-in templates, seeded into MongoDB and served until it is reachable
+DEFAULT_TEMPLATES = [
+    {
+        "id": "customer-support-v1",
+        "name": "Customer Support Agent",
+        "description": "AI agent for handling customer inquiries, FAQs, and support tickets using LangChain with Groq's Mixtral model",
+        "agent_type": AgentType.CUSTOMER_SUPPORT,
+        "framework": "LangChain",
+        "use_cases": [
+            "Answer frequently asked questions",
+            "Handle basic support tickets",
+            "Provide product information",
+            "Route complex issues to human agents"
+        ],
+        "default_config": {
+            "model": "mixtral-8x7b-32768",
+            "temperature": 0.1,
+            "max_tokens": 4096,
+            "system_prompt": "You are a helpful customer support agent. Your goal is to assist users with their inquiries in a friendly and professional manner."
+        }
+    },
+    {
+        "id": "content-writer-v1",
+        "name": "Content Writer Agent",
+        "description": "AI agent for generating blog posts, articles, and marketing content using CrewAI with Groq's Mixtral model",
+        "agent_type": AgentType.CONTENT_WRITER,
+        "framework": "CrewAI",
+        "use_cases": [
+            "Generate blog post ideas",
+            "Write SEO-optimized articles",
+            "Create social media content",
+            "Draft marketing copy"
+        ],
+        "default_config": {
+            "model": "mixtral-8x7b-32768",
+            "temperature": 0.1,
+            "max_tokens": 4096,
+            "system_prompt": "You are a creative content writer. Generate engaging and original content based on the user's requirements."
+        }
+    },
+    {
+        "id": "data-analyst-v1",
+        "name": "Data Analyst Agent",
+        "description": "AI agent for analyzing datasets and generating insights using AutoGen with Groq's Mixtral model",
+        "agent_type": AgentType.DATA_ANALYST,
+        "framework": "AutoGen",
+        "use_cases": [
+            "Analyze CSV/Excel data",
+            "Generate statistical summaries",
+            "Create data visualizations",
+            "Identify trends and patterns"
+        ],
+        "default_config": {
+            "model": "mixtral-8x7b-32768",
+            "temperature": 0.1,
+            "max_tokens": 4096,
+            "system_prompt": "You are a data analyst. Analyze the provided data and provide clear, actionable insights."
+        }
+    }
+]
+
+
+class TemplateCatalog:
+    """
+    Agent templates stored in MongoDB and indexed by id in every worker.
+    
+    Each write bumps a monotonic catalog version kept next to the templates.
+    Workers poll that version and reload the catalog when it moves, so all of
+    them serve the same templates within one poll interval. MongoDB change
+    streams would need a replica set; polling works on a standalone server.
+    Reads never touch the database.
+    """
+    
+    def __init__(self, defaults: List[Dict[str, Any]], poll_interval: float):
+        self.defaults = [AgentTemplate(**template) for template in defaults]
+        self.poll_interval = poll_interval
+        self.version = 0
+        self._index: Dict[str, AgentTemplate] = {}
+        self._templates: List[AgentTemplate] = []
+        self._serialized: Tuple[bytes, str] = (b"", "")
+        self._install(list(self.defaults))
+        self._db: Optional[AsyncDatabase] = None
+        self._seeded = False
+        self._task: Optional[asyncio.Task] = None
+    
+    def list(self) -> List[AgentTemplate]:
+        return self._templates
+    
+    def get(self, template_id: str) -> Optional[AgentTemplate]:
+        return self._index.get(template_id)
+    
+    def serialized(self) -> Tuple[bytes, str]:
+        """The catalog as JSON bytes and its strong ETag, built once per catalog change"""
+        return self._serialized
+    
+    def _install(self, templates: List[AgentTemplate]):
+        body = orjson.dumps([template.model_dump(mode="json") for template in templates])
+        # Derived from the content, so every worker hands out the same tag for the same catalog
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        # Swapped together so readers never see an index and bytes from different versions
+        self._index, self._templates, self._serialized = (
+            {template.id: template for template in templates}, templates, (body, etag)
+        )
+    
+    async def start(self, db: AsyncDatabase):
+        self._db = db
+        try:
+            await self._seed()
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Serving built-in templates until MongoDB is reachable: {e}")
+        self._task = asyncio.create_task(self._poll())
+    
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+    
+    async def _seed(self):
+        """Insert missing built-in templates once; safe when several workers start at once"""
+        if self._seeded:
+            return
+        await self._db[TEMPLATES_COLLECTION].create_index([("seq", ASCENDING)])
+        inserted = 0
+        for seq, template in enumerate(self.defaults):
+            result = await self._db[TEMPLATES_COLLECTION].update_one(
+                {"_id": template.id},
+                {"$setOnInsert": self._document(template, seq)},
+                upsert=True
+            )
+            inserted += result.upserted_id is not None
+        if inserted:
+            await self._bump_version()
+        self._seeded = True
+    
+    async def refresh(self):
+        """Reload the catalog if another worker changed it"""
+        meta = await self._db[META_COLLECTION].find_one({"_id": CATALOG_ID})
+        version = meta["version"] if meta else 0
+        # Version 0 is an unseeded catalog, whose empty collection must not replace the built-ins
+        if not version or version == self.version:
+            return
+        
+        # The version is read first, so the templates are at least that new
+        cursor = self._db[TEMPLATES_COLLECTION].find({}).sort("seq", ASCENDING)
+        templates = [self._template(doc) for doc in await cursor.to_list()]
+        self._install(templates)
+        self.version = version
+        logger.info(f"Loaded template catalog version {version} ({len(templates)} templates)")
+    
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                # Seeding is retried until MongoDB has been reachable once
+                await self._seed()
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Template catalog refresh failed: {e}")
+    
+    async def create(self, template: AgentTemplate) -> bool:
+        """Store a template; returns False if an identical one already exists"""
+        await self._ready()
+        result = await self._db[TEMPLATES_COLLECTION].update_one(
+            {"_id": template.id},
+            {"$setOnInsert": self._document(template, time.time_ns())},
+            upsert=True
+        )
+        if result.upserted_id is None:
+            existing = await self._db[TEMPLATES_COLLECTION].find_one({"_id": template.id})
+            if self._template(existing) != template:
+                raise TemplateConflictError(f"Template {template.id} already exists")
+            return False
+        await self._bump_version()
+        await self.refresh()
+        return True
+    
+    async def update_prompt(self, system_prompt: str, template_id: Optional[str] = None) -> int:
+        """Set the system prompt of one template, or of all when no id is given"""
+        await self._ready()
+        query = {"_id": template_id} if template_id else {}
+        result = await self._db[TEMPLATES_COLLECTION].update_many(
+            query, {"$set": {"default_config.system_prompt": system_prompt}}
+        )
+        if result.matched_count:
+            await self._bump_version()
+            await self.refresh()
+        return result.matched_count
+    
+    async def _ready(self):
+        """Fail like an unreachable database until storage has started, and seed before any write"""
+        if self._db is None:
+            raise ConnectionFailure("Template catalog storage has not started")
+        await self._seed()
+    
+    async def _bump_version(self):
+        await self._db[META_COLLECTION].update_one(
+            {"_id": CATALOG_ID}, {"$inc": {"version": 1}}, upsert=True
+        )
+    
+    def _document(self, template: AgentTemplate, seq: int) -> Dict[str, Any]:
+        return {"seq": seq, **template.model_dump(mode="json")}
+    
+    def _template(self, doc: Dict[str, Any]) -> AgentTemplate:
+        return AgentTemplate(**{key: value for key, value in doc.items() if key not in ("_id", "seq")})
+
+
+template_catalog = TemplateCatalog(DEFAULT_TEMPLATES, poll_interval=settings.TEMPLATE_CATALOG_POLL_SECONDS)
@@ -73,7 +73,6 @@ class TemplateService:
 
 template_service = TemplateService()
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pathlib import Path
 from typing import Dict, Any
 import os
@@ -81,13 +80,22 @@ import os
 
 class TemplateService:
     def __init__(self):
-        template_dir = Path(__file__).parent.parent / "templates"
-        self.env = Environment(
-            loader=FileSystemLoader(template_dir),
-            autoescape=select_autoescape(),
-            trim_blocks=True,
-            lstrip_blocks=True
-        )
+        self._env = None
+    
+    @property
+    def env(self):
+        """Jinja environment, built on first render"""
+        if self._env is None:
+            from jinja2 import Environment, FileSystemLoader, select_autoescape
+            template_dir = Path(__file__).parent.parent / "templates"
+            self._env = Environment(
+                loader=FileSystemLoader(template_dir),
+                # Manifests, Dockerfiles and HCL are rendered from strings and must not be HTML-escaped
+                autoescape=select_autoescape(default_for_string=False),
+                trim_blocks=True,
+                lstrip_blocks=True
+            )
+        return self._env
     
     def render_kubernetes_deployment(self, context: Dict[str, Any]) -> str:
         """Render Kubernetes deployment manifest"""
@@ -104,6 +112,11 @@ class TemplateService:
         template = self.env.from_string(self._get_dockerfile_template())
         return template.render(**context)
     
+    def render_dockerignore(self, context: Dict[str, Any]) -> str:
+        """Render .dockerignore for the generated image"""
+        template = self.env.from_string(self._get_dockerignore_template())
+        return template.render(**context)
+    
     def render_github_actions(self, context: Dict[str, Any]) -> str:
         """Render GitHub Actions workflow"""
         template = self.env.from_string(self._get_github_actions_template())
@@ -201,6 +214,21 @@ ENV PATH=/root/.local/bin:$PATH
 EXPOSE {{ port }}
 
 CMD ["uvicorn", "main:app", "--host", "0.0.0.0", "--port", "{{ port }}"]
+"""
+    
+    def _get_dockerignore_template(self) -> str:
+        return """# Only the agent code and its requirements belong in the image
+.dockerignore
+Dockerfile
+README.md
+.git
+.github/
+kubernetes/
+terraform/
+monitoring/
+__pycache__/
+*.py[cod]
+.env
 """
     
     def _get_github_actions_template(self) -> str:
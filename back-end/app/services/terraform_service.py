@@ -1,26 +1,193 @@
 import subprocess
+import hashlib
+import os
+import json
+import re
+import shutil
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEPENDENCY_LINE = re.compile(r'^\s*(source|version)\s*=\s*"[^"]*"', re.MULTILINE)
+TERRAFORM_ACTIONS = ("plan", "apply", "destroy")
+PLANS_DIR = ".paragon/plans"
+OUTPUTS_FILE = ".paragon/outputs.json"
+MAX_TERRAFORM_JOBS = 200
+MAX_JOB_OUTPUT_LINES = 20000
+
+
+class TerraformJob:
+    """A Terraform command running in the background with its captured output"""
+    
+    def __init__(self, job_id: str, action: str, working_dir: str,
+                 var_file: Optional[str] = None, auto_approve: bool = False):
+        self.job_id = job_id
+        self.action = action
+        self.working_dir = working_dir
+        self.var_file = var_file
+        self.auto_approve = auto_approve
+        self.plan_file: Optional[Path] = None
+        self.status = "pending"
+        self.returncode: Optional[int] = None
+        self.error: Optional[str] = None
+        self.result: Dict[str, Any] = {"changes": None, "diagnostics": [], "saved_plan": None}
+        self.progress = {"planned": 0, "completed": 0, "errored": 0}
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.cancel_requested = False
+        # Orders a cancel against the start of the process, so one always sees the other
+        self.process_lock = threading.Lock()
+        self.done = threading.Event()
+        self._lines: List[Dict[str, str]] = []
+        self._dropped_lines = 0
+        self._lock = threading.Lock()
+    
+    def mark_running(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = datetime.utcnow()
+    
+    def finish(self, status: str, returncode: Optional[int] = None, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.returncode = returncode
+            self.error = error
+            self.finished_at = datetime.utcnow()
+        self.done.set()
+    
+    def append_line(self, stream: str, text: str):
+        entry = {"stream": stream, "text": text}
+        message = None
+        if text.startswith("{"):
+            try:
+                message = json.loads(text)
+                entry["text"] = message.get("@message", text)
+            except ValueError:
+                pass
+        
+        with self._lock:
+            if message:
+                self._track(message)
+            self._lines.append(entry)
+            if len(self._lines) > MAX_JOB_OUTPUT_LINES:
+                del self._lines[0]
+                self._dropped_lines += 1
+    
+    def _track(self, message: Dict[str, Any]):
+        """Update progress and result from Terraform's machine-readable messages"""
+        kind = message.get("type")
+        if kind == "planned_change":
+            self.progress["planned"] += 1
+        elif kind == "apply_complete":
+            self.progress["completed"] += 1
+        elif kind == "apply_errored":
+            self.progress["errored"] += 1
+        elif kind == "change_summary":
+            self.result["changes"] = message.get("changes")
+        elif kind == "diagnostic":
+            diagnostic = message.get("diagnostic", {})
+            self.result["diagnostics"].append({
+                "severity": diagnostic.get("severity"),
+                "summary": diagnostic.get("summary"),
+                "detail": diagnostic.get("detail")
+            })
+    
+    def last_error(self) -> Optional[str]:
+        with self._lock:
+            for diagnostic in reversed(self.result["diagnostics"]):
+                if diagnostic["severity"] == "error":
+                    return diagnostic["summary"]
+            stderr = [line["text"] for line in self._lines if line["stream"] == "stderr"]
+        return "\n".join(stderr[-20:]) or f"terraform exited with {self.returncode}"
+    
+    def read_output(self, offset: int = 0) -> Dict[str, Any]:
+        with self._lock:
+            start = max(offset - self._dropped_lines, 0)
+            lines = self._lines[start:]
+            return {
+                "offset": self._dropped_lines + start,
+                "next_offset": self._dropped_lines + len(self._lines),
+                "lines": lines,
+                "finished": self.done.is_set()
+            }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "action": self.action,
+                "working_dir": self.working_dir,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "result": {
+                    "changes": self.result["changes"],
+                    "diagnostics": list(self.result["diagnostics"]),
+                    "saved_plan": self.result["saved_plan"]
+                },
+                "returncode": self.returncode,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
 
 class TerraformService:
     def __init__(self):
         self.terraform_bin = "terraform"
+        self.plugin_cache_dir = Path(settings.TERRAFORM_PLUGIN_CACHE_DIR)
+        self.module_cache_dir = Path(settings.TERRAFORM_MODULE_CACHE_DIR)
+        self.provider_mirror_dir = settings.TERRAFORM_PROVIDER_MIRROR_DIR
+        self._seed_lock = threading.Lock()
+        self.jobs: "OrderedDict[str, TerraformJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._workspace_locks: Dict[str, threading.Lock] = {}
+        self._run_slots = threading.BoundedSemaphore(settings.TERRAFORM_MAX_CONCURRENT_RUNS)
+        self._outputs: Dict[str, Dict[str, Any]] = {}
+        self._outputs_lock = threading.Lock()
     
     def init(self, working_dir: str) -> bool:
-        """Initialize Terraform working directory"""
+        """Initialize Terraform working directory from the shared caches"""
         try:
+            workspace = Path(working_dir)
+            seed_dir = self.module_cache_dir / self._dependency_key(workspace)
+            warm = (seed_dir / "modules" / "modules.json").exists()
+            
+            cmd = [self.terraform_bin, "init", "-input=false"]
+            if warm:
+                # Modules come from the mirror; providers are linked from the plugin cache
+                shutil.copytree(seed_dir / "modules", workspace / ".terraform" / "modules", dirs_exist_ok=True)
+                lock_file = workspace / ".terraform.lock.hcl"
+                if not lock_file.exists() and (seed_dir / ".terraform.lock.hcl").exists():
+                    shutil.copy2(seed_dir / ".terraform.lock.hcl", lock_file)
+                cmd.append("-get=false")
+            
+            started = time.perf_counter()
             result = subprocess.run(
-                [self.terraform_bin, "init"],
+                cmd,
                 cwd=working_dir,
                 capture_output=True,
-                text=True
+                text=True,
+                env=self._terraform_env()
             )
             if result.returncode == 0:
-                logger.info(f"Terraform initialized in {working_dir}")
+                logger.info(
+                    f"Terraform initialized in {working_dir} "
+                    f"({'warm' if warm else 'cold'}, {time.perf_counter() - started:.1f}s)"
+                )
+                if not warm:
+                    self._save_seed(workspace, seed_dir)
                 return True
             else:
                 logger.error(f"Terraform init failed: {result.stderr}")
@@ -29,105 +196,408 @@ class TerraformService:
             logger.error(f"Error initializing Terraform: {e}")
             return False
     
-    def plan(self, working_dir: str, var_file: Optional[str] = None) -> bool:
-        """Run Terraform plan"""
+    def prewarm(self, config: str) -> bool:
+        """Initialize a throwaway workspace so the first real init is already warm"""
+        workspace = self.module_cache_dir / f".prewarm-{uuid.uuid4().hex[:8]}"
         try:
-            cmd = [self.terraform_bin, "plan"]
-            if var_file:
-                cmd.extend(["-var-file", var_file])
-            
-            result = subprocess.run(
-                cmd,
-                cwd=working_dir,
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                logger.info("Terraform plan successful")
-                logger.debug(result.stdout)
-                return True
-            else:
-                logger.error(f"Terraform plan failed: {result.stderr}")
-                return False
-        except Exception as e:
-            logger.error(f"Error running Terraform plan: {e}")
-            return False
+            workspace.mkdir(parents=True)
+            (workspace / "main.tf").write_text(config)
+            return self.init(str(workspace))
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+    
+    def _dependency_key(self, workspace: Path) -> str:
+        """Fingerprint the provider and module constraints of a configuration"""
+        lines = []
+        for tf_file in sorted(workspace.glob("*.tf")):
+            lines.extend(match.group(0).strip() for match in DEPENDENCY_LINE.finditer(tf_file.read_text()))
+        return hashlib.sha256("\n".join(lines).encode()).hexdigest()[:16]
+    
+    def _save_seed(self, workspace: Path, seed_dir: Path):
+        """Copy installed modules and the dependency lock file into the module mirror"""
+        modules_dir = workspace / ".terraform" / "modules"
+        if not (modules_dir / "modules.json").exists():
+            return
+        with self._seed_lock:
+            if seed_dir.exists():
+                return
+            staging = seed_dir.with_name(f"{seed_dir.name}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                shutil.copytree(modules_dir, staging / "modules")
+                lock_file = workspace / ".terraform.lock.hcl"
+                if lock_file.exists():
+                    shutil.copy2(lock_file, staging / ".terraform.lock.hcl")
+                staging.rename(seed_dir)
+                logger.info(f"Saved Terraform modules to mirror {seed_dir}")
+            except OSError as e:
+                logger.warning(f"Failed to populate Terraform module mirror: {e}")
+                shutil.rmtree(staging, ignore_errors=True)
+    
+    def _terraform_env(self) -> Dict[str, str]:
+        """Environment for Terraform subprocesses sharing one provider plugin cache"""
+        self.plugin_cache_dir.mkdir(parents=True, exist_ok=True)
+        env = os.environ.copy()
+        env["TF_PLUGIN_CACHE_DIR"] = str(self.plugin_cache_dir)
+        env["TF_IN_AUTOMATION"] = "1"
+        env["TF_INPUT"] = "0"
+        if self.provider_mirror_dir:
+            env["TF_CLI_CONFIG_FILE"] = str(self._write_cli_config())
+        return env
+    
+    def _write_cli_config(self) -> Path:
+        """Write a CLI config that installs providers from the local filesystem mirror"""
+        config_file = self.plugin_cache_dir.parent / "paragon.tfrc"
+        config = f"""provider_installation {{
+  filesystem_mirror {{
+    path = "{self.provider_mirror_dir}"
+  }}
+}}
+"""
+        if not config_file.exists() or config_file.read_text() != config:
+            config_file.write_text(config)
+        return config_file
+    
+    def plan(self, working_dir: str, var_file: Optional[str] = None) -> bool:
+        """Run Terraform plan and wait for it to finish"""
+        job_id = self.submit("plan", working_dir, var_file=var_file)
+        return self._wait_for_success(job_id)
     
     def apply(self, working_dir: str, var_file: Optional[str] = None, auto_approve: bool = False) -> bool:
-        """Apply Terraform configuration"""
-        try:
-            cmd = [self.terraform_bin, "apply"]
-            if var_file:
-                cmd.extend(["-var-file", var_file])
-            if auto_approve:
-                cmd.append("-auto-approve")
-            
-            result = subprocess.run(
-                cmd,
-                cwd=working_dir,
-                capture_output=True,
-                text=True
+        """Apply Terraform configuration and wait for it to finish"""
+        job_id = self.submit("apply", working_dir, var_file=var_file, auto_approve=auto_approve)
+        return self._wait_for_success(job_id)
+    
+    def destroy(self, working_dir: str, var_file: Optional[str] = None, auto_approve: bool = False) -> bool:
+        """Destroy Terraform-managed infrastructure and wait for it to finish"""
+        job_id = self.submit("destroy", working_dir, var_file=var_file, auto_approve=auto_approve)
+        return self._wait_for_success(job_id)
+    
+    def submit(self, action: str, working_dir: str, var_file: Optional[str] = None,
+               auto_approve: bool = False) -> str:
+        """Start a plan, apply or destroy in the background and return its job id"""
+        if action not in TERRAFORM_ACTIONS:
+            raise ValueError(f"Unsupported Terraform action: {action}")
+        
+        job = TerraformJob(
+            str(uuid.uuid4()),
+            action,
+            str(Path(working_dir).resolve()),
+            var_file=var_file,
+            auto_approve=auto_approve
+        )
+        with self._jobs_lock:
+            self.jobs[job.job_id] = job
+            self._prune_jobs()
+        
+        threading.Thread(
+            target=self._run_job,
+            args=(job,),
+            name=f"terraform-{action}-{job.job_id[:8]}",
+            daemon=True
+        ).start()
+        return job.job_id
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get status, progress and result of a Terraform job"""
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+    
+    def get_job_output(self, job_id: str, offset: int = 0) -> Optional[Dict[str, Any]]:
+        """Get output lines of a Terraform job starting at offset"""
+        job = self.jobs.get(job_id)
+        return job.read_output(offset) if job else None
+    
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a queued or running Terraform job"""
+        job = self.jobs.get(job_id)
+        if job is None or job.done.is_set():
+            return False
+        
+        with job.process_lock:
+            job.cancel_requested = True
+            process = job.process
+        if process and process.poll() is None:
+            # Terraform stops gracefully on SIGINT and releases its state lock
+            process.send_signal(signal.SIGINT)
+            timer = threading.Timer(
+                settings.TERRAFORM_CANCEL_GRACE_SECONDS,
+                self._kill_if_running,
+                args=(process,)
             )
-            
-            if result.returncode == 0:
-                logger.info("Terraform apply successful")
-                return True
-            else:
-                logger.error(f"Terraform apply failed: {result.stderr}")
-                return False
-        except Exception as e:
-            logger.error(f"Error applying Terraform: {e}")
+            timer.daemon = True
+            timer.start()
+        return True
+    
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a Terraform job finishes"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.to_dict()
+    
+    def _wait_for_success(self, job_id: str) -> bool:
+        job = self.wait(job_id)
+        if job["status"] != "succeeded":
+            logger.error(f"Terraform {job['action']} failed: {job['error']}")
             return False
+        logger.info(f"Terraform {job['action']} successful")
+        return True
     
-    def destroy(self, working_dir: str, var_file: Optional[str] = None, auto_approve: bool = False) -> bool:
-        """Destroy Terraform-managed infrastructure"""
+    def _run_job(self, job: "TerraformJob"):
+        """Run a job once its workspace lock and a global run slot are free"""
+        workspace_lock = self._get_workspace_lock(job.working_dir)
+        if not self._acquire_while_pending(job, workspace_lock):
+            return
         try:
-            cmd = [self.terraform_bin, "destroy"]
-            if var_file:
-                cmd.extend(["-var-file", var_file])
-            if auto_approve:
-                cmd.append("-auto-approve")
-            
-            result = subprocess.run(
-                cmd,
-                cwd=working_dir,
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                logger.info("Terraform destroy successful")
-                return True
-            else:
-                logger.error(f"Terraform destroy failed: {result.stderr}")
+            if not self._acquire_while_pending(job, self._run_slots):
+                return
+            try:
+                self._execute(job)
+            finally:
+                self._run_slots.release()
+        finally:
+            workspace_lock.release()
+    
+    def _acquire_while_pending(self, job: "TerraformJob", lock) -> bool:
+        while not lock.acquire(timeout=0.5):
+            if job.cancel_requested:
+                job.finish("cancelled")
                 return False
-        except Exception as e:
-            logger.error(f"Error destroying Terraform resources: {e}")
+        if job.cancel_requested:
+            lock.release()
+            job.finish("cancelled")
             return False
+        return True
+    
+    def _execute(self, job: "TerraformJob"):
+        job.mark_running()
+        if not (Path(job.working_dir) / ".terraform").exists():
+            job.append_line("stdout", "Initializing working directory")
+            if not self.init(job.working_dir):
+                job.finish("failed", error="terraform init failed")
+                return
+        if job.cancel_requested:
+            job.finish("cancelled")
+            return
+        
+        cmd = self._build_command(job)
+        if cmd is None:
+            job.finish("succeeded", returncode=0)
+            return
+        if job.action in ("apply", "destroy"):
+            # Outputs are stale as soon as infrastructure starts changing
+            self._invalidate_outputs(job.working_dir)
+        
+        with job.process_lock:
+            if job.cancel_requested:
+                if job.plan_file:
+                    job.plan_file.unlink(missing_ok=True)
+                job.finish("cancelled")
+                return
+            try:
+                job.process = subprocess.Popen(
+                    cmd,
+                    cwd=job.working_dir,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    bufsize=1,
+                    env=self._terraform_env()
+                )
+            except Exception as e:
+                logger.error(f"Error starting Terraform {job.action}: {e}")
+                job.finish("failed", error=str(e))
+                return
+        
+        readers = [
+            threading.Thread(target=self._pump, args=(job, job.process.stdout, "stdout"), daemon=True),
+            threading.Thread(target=self._pump, args=(job, job.process.stderr, "stderr"), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        returncode = job.process.wait()
+        for reader in readers:
+            reader.join()
+        
+        if job.action == "plan" and job.plan_file:
+            if returncode == 0 and not job.cancel_requested:
+                self._save_plan_summary(job)
+            else:
+                job.plan_file.unlink(missing_ok=True)
+        elif job.action == "apply" and job.result["saved_plan"]:
+            # A saved plan can only be applied once, whatever the outcome
+            Path(job.result["saved_plan"]).unlink(missing_ok=True)
+        elif job.action == "destroy":
+            shutil.rmtree(Path(job.working_dir) / PLANS_DIR, ignore_errors=True)
+        
+        if job.action == "apply" and returncode == 0 and not job.cancel_requested:
+            # Still holding the workspace lock, so no other run can change state meanwhile
+            self._refresh_outputs(job.working_dir)
+        
+        if job.cancel_requested:
+            job.finish("cancelled", returncode=returncode)
+        elif returncode == 0:
+            job.finish("succeeded", returncode=returncode)
+        else:
+            job.finish("failed", returncode=returncode, error=job.last_error())
+    
+    def _build_command(self, job: "TerraformJob") -> Optional[List[str]]:
+        """Build the command for a job, reusing a saved plan when inputs are unchanged"""
+        cmd = [self.terraform_bin, job.action, "-input=false", "-no-color"]
+        plans_dir = Path(job.working_dir) / PLANS_DIR
+        plan_file = plans_dir / f"{self._plan_key(job.working_dir, job.var_file)}.tfplan"
+        summary_file = plan_file.with_suffix(".json")
+        
+        if job.action == "plan":
+            if plan_file.exists() and summary_file.exists():
+                job.append_line("stdout", "Configuration unchanged since last plan, reusing saved plan")
+                job.result["changes"] = json.loads(summary_file.read_text()).get("changes")
+                job.result["saved_plan"] = str(plan_file)
+                return None
+            # Only the plan for the current inputs is worth keeping
+            shutil.rmtree(plans_dir, ignore_errors=True)
+            plans_dir.mkdir(parents=True, exist_ok=True)
+            job.plan_file = plan_file
+            if job.var_file:
+                cmd.extend(["-var-file", job.var_file])
+            cmd.extend([f"-out={plan_file}", "-json"])
+            return cmd
+        
+        if job.action == "apply" and plan_file.exists():
+            # Variables are baked into the saved plan, and applying it never prompts
+            job.append_line("stdout", f"Applying saved plan {plan_file.name}")
+            job.result["saved_plan"] = str(plan_file)
+            summary_file.unlink(missing_ok=True)
+            cmd.extend(["-json", str(plan_file)])
+            return cmd
+        
+        if job.var_file:
+            cmd.extend(["-var-file", job.var_file])
+        if job.auto_approve:
+            # Machine-readable output lets us report progress and a parsed result
+            cmd.extend(["-auto-approve", "-json"])
+        return cmd
+    
+    def _plan_key(self, working_dir: str, var_file: Optional[str] = None) -> str:
+        """Hash the rendered configuration, var file and provider lock"""
+        workspace = Path(working_dir)
+        digest = hashlib.sha256()
+        inputs = sorted(workspace.glob("*.tf")) + [workspace / ".terraform.lock.hcl"]
+        if var_file:
+            inputs.append(workspace / var_file)
+        for path in inputs:
+            if path.exists():
+                digest.update(path.name.encode())
+                digest.update(path.read_bytes())
+        return digest.hexdigest()[:32]
+    
+    def _save_plan_summary(self, job: "TerraformJob"):
+        summary_file = job.plan_file.with_suffix(".json")
+        summary_file.write_text(json.dumps({
+            "changes": job.result["changes"],
+            "created_at": datetime.utcnow().isoformat()
+        }))
+        job.result["saved_plan"] = str(job.plan_file)
+    
+    def _pump(self, job: "TerraformJob", stream, name: str):
+        for line in stream:
+            job.append_line(name, line.rstrip("\n"))
+        stream.close()
+    
+    def _kill_if_running(self, process: subprocess.Popen):
+        if process.poll() is None:
+            logger.warning(f"Terraform process {process.pid} ignored SIGINT, killing it")
+            process.kill()
+    
+    def _get_workspace_lock(self, working_dir: str) -> threading.Lock:
+        with self._jobs_lock:
+            return self._workspace_locks.setdefault(working_dir, threading.Lock())
+    
+    def _prune_jobs(self):
+        """Drop the oldest finished jobs once the job table is full"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        excess = len(self.jobs) - MAX_TERRAFORM_JOBS
+        for job_id in finished[:max(excess, 0)]:
+            del self.jobs[job_id]
     
-    def output(self, working_dir: str, output_name: Optional[str] = None) -> Optional[str]:
-        """Get Terraform output values"""
+    def output(self, working_dir: str, output_name: Optional[str] = None) -> Optional[Any]:
+        """Get one Terraform output value, or all of them, from the workspace record"""
+        record = self.outputs(working_dir)
+        if record is None:
+            return None
+        if output_name:
+            return record["values"].get(output_name)
+        return record["values"]
+    
+    def outputs(self, working_dir: str) -> Optional[Dict[str, Any]]:
+        """Get the structured output record captured after the last successful apply"""
+        workspace = str(Path(working_dir).resolve())
+        with self._outputs_lock:
+            record = self._outputs.get(workspace)
+        if record is not None:
+            return record
+        
+        outputs_file = Path(workspace) / OUTPUTS_FILE
+        if outputs_file.exists():
+            try:
+                record = json.loads(outputs_file.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Discarding unreadable Terraform outputs {outputs_file}: {e}")
+                record = None
+        if record is None and (Path(workspace) / "terraform.tfstate").exists():
+            # Applied before outputs were recorded, read them from state once. A
+            # running job owns the workspace and records fresh outputs itself
+            workspace_lock = self._get_workspace_lock(workspace)
+            if not workspace_lock.acquire(blocking=False):
+                return None
+            try:
+                with self._outputs_lock:
+                    record = self._outputs.get(workspace)
+                if record is None:
+                    record = self._refresh_outputs(workspace)
+            finally:
+                workspace_lock.release()
+        if record is not None:
+            with self._outputs_lock:
+                self._outputs[workspace] = record
+        return record
+    
+    def _refresh_outputs(self, workspace: str) -> Optional[Dict[str, Any]]:
+        """Read all outputs with `terraform output -json` and persist them"""
         try:
-            cmd = [self.terraform_bin, "output", "-json"]
-            if output_name:
-                cmd.append(output_name)
-            
             result = subprocess.run(
-                cmd,
-                cwd=working_dir,
+                [self.terraform_bin, "output", "-json"],
+                cwd=workspace,
                 capture_output=True,
-                text=True
+                text=True,
+                env=self._terraform_env()
             )
             
-            if result.returncode == 0:
-                return result.stdout
-            else:
+            if result.returncode != 0:
                 logger.error(f"Terraform output failed: {result.stderr}")
                 return None
+            
+            raw = json.loads(result.stdout or "{}")
+            record = {
+                "values": {name: item.get("value") for name, item in raw.items()},
+                "sensitive": sorted(name for name, item in raw.items() if item.get("sensitive")),
+                "updated_at": datetime.utcnow().isoformat()
+            }
+            outputs_file = Path(workspace) / OUTPUTS_FILE
+            outputs_file.parent.mkdir(parents=True, exist_ok=True)
+            outputs_file.write_text(json.dumps(record))
+            with self._outputs_lock:
+                self._outputs[workspace] = record
+            return record
         except Exception as e:
             logger.error(f"Error getting Terraform output: {e}")
             return None
+    
+    def _invalidate_outputs(self, workspace: str):
+        with self._outputs_lock:
+            self._outputs.pop(workspace, None)
+        (Path(workspace) / OUTPUTS_FILE).unlink(missing_ok=True)
 
 
 terraform_service = TerraformService()
\ No newline at end of file
@@ -0,0 +1,177 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from time import perf_counter, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.config import settings
+import functools
+import inspect
+import threading
+
+# Stages range from millisecond disk writes to minute-long LLM calls
+STAGE_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0]
+
+# The run being timed, copied into executor threads along with the rest of the context
+_current_run: ContextVar[Optional["Run"]] = ContextVar("current_run", default=None)
+# Stage timings of the current request, rendered into its Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+class Run:
+    """Stage durations of one generation or deployment"""
+
+    __slots__ = ("operation", "stages", "started")
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.stages: Dict[str, float] = {}
+        self.started = perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        # A stage entered several times, e.g. one disk write per file, adds up
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage of the current run; a no-op outside of one"""
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        run.add(stage, perf_counter() - started)
+
+
+class StageTimings:
+    """
+    Per-stage latency histograms and the slowest recent runs of each operation.
+
+    Runs execute on worker threads, so updates take a lock. Only runs that
+    finished within `window` seconds are kept, `capacity` per operation.
+    """
+
+    def __init__(self, capacity: int, window: float):
+        self.capacity = capacity
+        self.window = window
+        self._lock = threading.Lock()
+        # (operation, stage) -> [sum, one count per STAGE_BUCKETS bound plus +Inf, not cumulative]
+        self.histograms: Dict[Tuple[str, str], list] = {}
+        self.slowest: Dict[str, List[Dict[str, Any]]] = {}
+
+    def timed(self, operation: str, key: Optional[str] = None):
+        """
+        Decorator timing a service call as one run of `operation`.
+
+        The run's status comes from the "status" of the returned dict. `key`
+        names an argument or result field identifying the run, e.g. generation_id.
+        """
+        def decorator(func: Callable) -> Callable:
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                run = Run(operation)
+                token = _current_run.set(run)
+                status = "error"
+                result = None
+                try:
+                    result = func(*args, **kwargs)
+                    if isinstance(result, dict):
+                        status = result.get("status", "ok")
+                    return result
+                finally:
+                    _current_run.reset(token)
+                    identifier = None
+                    if key:
+                        if isinstance(result, dict) and key in result:
+                            identifier = result[key]
+                        else:
+                            identifier = signature.bind_partial(*args, **kwargs).arguments.get(key)
+                    self.finish(run, status, identifier)
+            return wrapper
+        return decorator
+
+    def finish(self, run: Run, status: str, identifier: Optional[str] = None):
+        total = perf_counter() - run.started
+        stages = dict(run.stages, total=total)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.extend(stages.items())
+
+        entry = {
+            "operation": run.operation,
+            "id": identifier,
+            "status": status,
+            "finished_at": datetime.utcnow().isoformat(),
+            "finished": time(),
+            "duration": total,
+            "stages": run.stages
+        }
+        with self._lock:
+            for stage, seconds in stages.items():
+                histogram = self.histograms.get((run.operation, stage))
+                if histogram is None:
+                    histogram = self.histograms[(run.operation, stage)] = [0.0, [0] * (len(STAGE_BUCKETS) + 1)]
+                histogram[0] += seconds
+                histogram[1][bisect_left(STAGE_BUCKETS, seconds)] += 1
+
+            slowest = [
+                kept for kept in self.slowest.get(run.operation, []) if kept["finished"] > entry["finished"] - self.window
+            ]
+            slowest.append(entry)
+            if len(slowest) > self.capacity:
+                slowest.remove(min(slowest, key=lambda kept: kept["duration"]))
+            self.slowest[run.operation] = slowest
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable copy of the histograms and slowest runs"""
+        with self._lock:
+            return {
+                "histograms": [
+                    {"operation": operation, "stage": stage, "sum": latency_sum, "buckets": list(buckets)}
+                    for (operation, stage), (latency_sum, buckets) in self.histograms.items()
+                ],
+                "slowest": {operation: list(runs) for operation, runs in self.slowest.items()}
+            }
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> bytes:
+    """Server-Timing header value, durations in milliseconds"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings).encode("latin-1")
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware adding a Server-Timing header for the stages timed while serving a request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings:
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", server_timing(timings))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+
+
+stage_timings = StageTimings(
+    capacity=settings.TIMING_SLOW_RUNS,
+    window=settings.TIMING_SLOW_RUN_WINDOW_SECONDS
+)
@@ -0,0 +1,85 @@
+"""
+Show that GET /agents/templates stays fast while long deployments run.
+
+Deployments are replaced by a fake that blocks its thread like a slow kubectl
+run. The app is driven in-process through httpx's ASGI transport while a probe
+samples /agents/templates latency. With --inline the fake is called directly
+on the event loop, as the routers used to do, for comparison.
+
+    python -m benchmarks.bench_concurrency --deploys 8 --deploy-seconds 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import main
+from app.executors import executors
+from app.services.deployment_service import deployment_service
+
+
+def fake_deploy(deploy_seconds: float):
+    def deploy_to_kubernetes(generation_id: str, namespace: str, replicas: int):
+        time.sleep(deploy_seconds)
+        return {"status": "deployed", "endpoint": "http://agent.example"}
+    return deploy_to_kubernetes
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    # Latency is measured from when the request was due, so event loop stalls count too
+    latencies = []
+    due = time.perf_counter()
+    while True:
+        response = await client.get("/agents/templates")
+        response.raise_for_status()
+        finished = time.perf_counter()
+        latencies.append((finished - due) * 1000)
+        if stop.is_set():
+            return latencies
+        due = finished + interval
+        await asyncio.sleep(interval)
+
+
+async def run(deploys: int, deploy_seconds: float, inline: bool):
+    deployment_service.deploy_to_kubernetes = fake_deploy(deploy_seconds)
+    if inline:
+        async def run_inline(func, *args, **kwargs):
+            return func(*args, **kwargs)
+        executors.run_subprocess = run_inline
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        baseline = asyncio.create_task(probe(client, stop, 0.02))
+        await asyncio.sleep(1)
+        stop.set()
+        idle = await baseline
+
+        stop = asyncio.Event()
+        probing = asyncio.create_task(probe(client, stop, 0.02))
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            client.post("/deployments/", json={"generation_id": f"gen-{i}", "cloud_provider": "aws"}, timeout=None)
+            for i in range(deploys)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        busy = await probing
+
+    print(f"mode: {'inline' if inline else 'executors'}, {deploys} deploys took {elapsed:.1f}s")
+    for label, latencies in (("idle", idle), ("during deploys", busy)):
+        ordered = sorted(latencies)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        print(f"/agents/templates {label:>15}: n={len(ordered):4d} "
+              f"p50={statistics.median(ordered):8.2f}ms p99={p99:8.2f}ms max={ordered[-1]:8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deploys", type=int, default=8)
+    parser.add_argument("--deploy-seconds", type=float, default=3.0)
+    parser.add_argument("--inline", action="store_true", help="call the blocking service on the event loop")
+    args = parser.parse_args()
+    asyncio.run(run(args.deploys, args.deploy_seconds, args.inline))
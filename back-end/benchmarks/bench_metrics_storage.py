@@ -0,0 +1,102 @@
+"""
+Compare request_metrics storage as plain documents and as a time-series collection.
+
+Seeds the same synthetic events into both layouts in a scratch database and
+reports storage per million events and query latency for the dashboard chart
+and a per-deployment range scan.
+
+    python -m benchmarks.bench_metrics_storage --documents 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pymongo
+
+from app.routers.metrics import align_to_bucket, build_request_count_pipeline, parse_bucket, parse_interval
+
+ENDPOINTS = ["/chat", "/query", "/health"]
+DEPLOYMENTS = [f"deployment-{i}" for i in range(50)]
+
+
+def events(documents: int, batch_size: int = 50000):
+    now = datetime.utcnow()
+    window = timedelta(days=7).total_seconds()
+    produced = 0
+    while produced < documents:
+        batch = []
+        for _ in range(min(batch_size, documents - produced)):
+            batch.append({
+                "timestamp": now - timedelta(seconds=random.random() * window),
+                "deployment_id": random.choice(DEPLOYMENTS),
+                "endpoint": random.choice(ENDPOINTS),
+                "method": "POST",
+                "status": 500 if random.random() < 0.02 else 200,
+                "duration": random.expovariate(5)
+            })
+        produced += len(batch)
+        yield batch
+
+
+def create_layouts(db):
+    db.drop_collection("plain")
+    db.drop_collection("timeseries")
+    db.create_collection("plain")
+    db.create_collection(
+        "timeseries",
+        timeseries={"timeField": "timestamp", "metaField": "deployment_id", "granularity": "seconds"}
+    )
+    for name in ("plain", "timeseries"):
+        db[name].create_index([("timestamp", pymongo.ASCENDING), ("status", pymongo.ASCENDING)])
+    db.plain.create_index([("deployment_id", pymongo.ASCENDING), ("timestamp", pymongo.ASCENDING)])
+
+
+def storage(db, name: str) -> dict:
+    stats = next(db[name].aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+    return {"data": stats.get("storageSize", 0), "indexes": stats.get("totalIndexSize", 0)}
+
+
+def timed(run, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="paragonai_bench")
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    db = pymongo.MongoClient(args.mongo_url)[args.db]
+    create_layouts(db)
+    for batch in events(args.documents):
+        db.plain.insert_many([dict(event) for event in batch], ordered=False)
+        db.timeseries.insert_many(batch, ordered=False)
+
+    end_time = datetime.utcnow()
+    delta = parse_interval("1h")
+    unit, bin_size = parse_bucket("1h")
+    first_bucket = align_to_bucket(end_time - timedelta(hours=24), delta)
+    chart = build_request_count_pipeline(first_bucket, align_to_bucket(end_time, delta) + delta, end_time, unit, bin_size)
+    per_deployment = {"deployment_id": DEPLOYMENTS[0], "timestamp": {"$gte": end_time - timedelta(days=1)}}
+
+    per_million = 1_000_000 / args.documents
+    print(f"{'layout':>11} {'data MB/1M':>11} {'index MB/1M':>12} {'chart ms':>9} {'scan ms':>8}")
+    for name in ("plain", "timeseries"):
+        sizes = storage(db, name)
+        chart_ms = timed(lambda: list(db[name].aggregate(chart)), args.runs)
+        scan_ms = timed(lambda: list(db[name].find(per_deployment)), args.runs)
+        print(f"{name:>11} {sizes['data'] * per_million / 2**20:>11.1f} "
+              f"{sizes['indexes'] * per_million / 2**20:>12.1f} {chart_ms:>9.1f} {scan_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
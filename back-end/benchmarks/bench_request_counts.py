@@ -0,0 +1,84 @@
+"""
+Benchmark GET /metrics/requests/count against a large request_metrics collection.
+
+Seeds synthetic request events spread over the last 30 days into a scratch
+database, then times the chart aggregation for each dashboard range.
+
+    python -m benchmarks.bench_request_counts --documents 10000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pymongo
+
+from app.routers.metrics import (
+    align_to_bucket, build_request_count_pipeline, calculate_start_time, parse_bucket, parse_interval
+)
+
+RANGES = [("1h", "5m"), ("24h", "1h"), ("7d", "6h"), ("30d", "1d")]
+ENDPOINTS = ["/generation/generate", "/deployments/", "/agents/templates", "/metrics/requests/count"]
+
+
+def seed(collection, documents: int, batch_size: int = 50000):
+    now = datetime.utcnow()
+    window = timedelta(days=30).total_seconds()
+    inserted = 0
+    while inserted < documents:
+        batch = []
+        for _ in range(min(batch_size, documents - inserted)):
+            batch.append({
+                "timestamp": now - timedelta(seconds=random.random() * window),
+                "endpoint": random.choice(ENDPOINTS),
+                "method": "GET",
+                "status": 500 if random.random() < 0.02 else 200,
+                "duration": random.expovariate(20)
+            })
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+        print(f"seeded {inserted}/{documents}", end="\r")
+    print()
+
+
+def time_pipeline(collection, time_range: str, interval: str, runs: int) -> list:
+    delta = parse_interval(interval)
+    unit, bin_size = parse_bucket(interval)
+    timings = []
+    for _ in range(runs):
+        end_time = datetime.utcnow()
+        first_bucket = align_to_bucket(calculate_start_time(time_range, end_time), delta)
+        last_bucket = align_to_bucket(end_time, delta)
+        pipeline = build_request_count_pipeline(
+            first_bucket, last_bucket + delta, end_time, unit, bin_size
+        )
+        started = time.perf_counter()
+        list(collection.aggregate(pipeline))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="paragonai_bench")
+    parser.add_argument("--documents", type=int, default=10_000_000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--reseed", action="store_true", help="drop and reseed the collection")
+    args = parser.parse_args()
+
+    collection = pymongo.MongoClient(args.mongo_url)[args.db].request_metrics
+    if args.reseed or collection.estimated_document_count() < args.documents:
+        collection.drop()
+        seed(collection, args.documents)
+    collection.create_index([("timestamp", pymongo.ASCENDING), ("status", pymongo.ASCENDING)])
+
+    print(f"{'range':>6} {'interval':>8} {'p50 ms':>10} {'max ms':>10}")
+    for time_range, interval in RANGES:
+        timings = time_pipeline(collection, time_range, interval, args.runs)
+        print(f"{time_range:>6} {interval:>8} {statistics.median(timings):>10.1f} {max(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measure application cold start: import profile and time until the pod is ready.
+
+Starts uvicorn in a fresh process and polls GET / until it answers, which is
+what a readiness probe sees. Run it against an older checkout with --app-dir
+to compare.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACK_END = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_profile(app_dir: Path, env: dict, top: int):
+    """Slowest modules by cumulative import time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=app_dir, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, own, cumulative, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        rows.append((int(cumulative), name))
+    rows.sort(reverse=True)
+    print(f"{'cumulative ms':>14}  module")
+    for cumulative, name in rows[:top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+
+def time_to_ready(app_dir: Path, env: dict, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", type=Path, default=BACK_END)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    # No Docker daemon, LLM key or reachable MongoDB, as on a cold pod whose dependencies are still starting
+    env = dict(os.environ)
+    env.setdefault("MONGODB_URL", "mongodb://127.0.0.1:1")
+    env.setdefault("DOCKER_HOST", "unix:///nonexistent/docker.sock")
+    env.setdefault("METRICS_SHARED_DIR", f"/tmp/paragon_startup_bench_{os.getpid()}")
+    env.setdefault("EXPORTER_PORT", str(free_port()))
+
+    import_profile(args.app_dir, env, args.top)
+    timings = [time_to_ready(args.app_dir, env, args.timeout) for _ in range(args.runs)]
+    print(f"\nready in p50={statistics.median(timings):.2f}s min={min(timings):.2f}s max={max(timings):.2f}s "
+          f"over {args.runs} runs")
+
+
+if __name__ == "__main__":
+    main()
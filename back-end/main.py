@@ -1,14 +1,119 @@
 # main.py
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from app.routers.generation import router as generation_router
 from app.routers.deployments import router as deployments_router
 from app.routers.agents import router as agents_router
 from app.routers.metrics import router as metrics_router
+from app.routers.terraform import router as terraform_router
 from app.services.mongodb_exporter import MongoDBExporter
+from app.database import database
+from app.instrumentation import InstrumentationMiddleware, request_metrics, shared_metrics
+from app.services.metrics_buffer import metrics_buffer
+from app.services.deployment_metrics import deployment_metrics
+from app.services.request_metrics_service import request_metrics_service
+from app.services.template_catalog import template_catalog
+from app.executors import executors
+from app.request_logging import RequestLoggingMiddleware, request_log
+from app.idempotency import IdempotencyMiddleware, idempotency_store
+from app.timing import ServerTimingMiddleware
+from app.config import settings
+from pathlib import Path
+import asyncio
 import threading
 import logging
 
-app = FastAPI()
+
+def warm_up_services():
+    """Create the lazily initialized service clients ahead of the first request"""
+    from app.services.template_service import template_service
+    from app.services.docker_service import docker_service
+    from app.services.llm_service import llm_service
+    
+    template_service.env
+    docker_service.client
+    try:
+        llm_service.client
+    except ValueError as e:
+        logging.getLogger(__name__).warning(f"LLM client unavailable: {e}")
+
+
+def log_warm_up_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.getLogger(__name__).warning(f"Service warm-up failed: {task.exception()}")
+
+
+def prewarm_terraform():
+    """Run terraform init once against the EKS template to fill the shared caches"""
+    from app.services.terraform_service import terraform_service
+    from app.services.template_service import template_service
+    config = template_service.render_terraform_eks({
+        "cluster_name": "prewarm-cluster",
+        "aws_region": settings.AWS_REGION,
+        "min_nodes": 1,
+        "max_nodes": 1,
+        "desired_nodes": 1,
+        "instance_type": "t3.medium"
+    })
+    terraform_service.prewarm(config)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+    logger.info("Starting ParagonAI Agent Deployment Platform")
+    request_log.start()
+    
+    # Every worker publishes its counters; only one worker per pod binds the exporter port
+    shared_metrics.start()
+    exporter = MongoDBExporter(db=database.get_db(), port=settings.EXPORTER_PORT)
+    exporter_task = asyncio.create_task(
+        exporter.run_when_elected(str(Path(settings.METRICS_SHARED_DIR) / "exporter.lock"))
+    )
+    
+    async def start_storage():
+        # One pooled client for the whole app; the exporter shares it
+        await database.connect()
+        # Request events are batched into request_metrics off the request path
+        metrics_buffer.start(database.get_db())
+        await deployment_metrics.start(database.get_db())
+        await template_catalog.start(database.get_db())
+        await idempotency_store.start(database.get_db())
+    
+    # Serving starts without waiting on MongoDB; events recorded meanwhile stay buffered
+    storage_task = asyncio.create_task(start_storage())
+    # Raw events expire quickly; hourly per-deployment buckets are kept much longer
+    downsample_task = asyncio.create_task(request_metrics_service.run_downsampling(database.get_db()))
+    
+    warm_up_task = None
+    if settings.WARM_SERVICES_ON_STARTUP:
+        # Readiness does not wait for this; it only takes the setup cost off the first requests
+        warm_up_task = asyncio.create_task(executors.run_io(warm_up_services))
+        warm_up_task.add_done_callback(log_warm_up_failure)
+    
+    if settings.TERRAFORM_PREWARM:
+        # Warm caches let the first generation init quickly
+        threading.Thread(target=prewarm_terraform, daemon=True).start()
+    
+    yield
+    
+    exporter_task.cancel()
+    storage_task.cancel()
+    if warm_up_task:
+        warm_up_task.cancel()
+    downsample_task.cancel()
+    # Drain buffered request events so rolling restarts lose nothing
+    await metrics_buffer.close()
+    await deployment_metrics.close()
+    await template_catalog.close()
+    await shared_metrics.close()
+    await database.close()
+    executors.shutdown()
+    request_log.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def root():
@@ -18,45 +123,34 @@ async def root():
 async def test():
     return {"message": "Test endpoint is working!"}
 
-# Middleware for logging requests
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger = logging.getLogger(__name__)
-    logger.info(f"Incoming request: {request.method} {request.url}")
-    logger.info(f"Headers: {dict(request.headers)}")
-    
-    # Log request body for POST requests
-    if request.method == "POST":
-        body = await request.body()
-        try:
-            logger.info(f"Request body: {body.decode()}")
-        except:
-            logger.info("Could not decode request body")
-    
-    response = await call_next(request)
-    return response
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Summed across all workers of this pod, whichever one answers the scrape
+    return Response(shared_metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Retried generation and deployment POSTs replay the first response instead of redoing the work
+app.add_middleware(IdempotencyMiddleware, store=idempotency_store, routes=settings.IDEMPOTENCY_ROUTES)
+
+# Per-stage durations of generations and deployments; outside idempotency so replays never carry stale timings
+app.add_middleware(ServerTimingMiddleware)
+
+# Sampled JSON request log, written by a background thread
+if settings.REQUEST_LOG_ENABLED:
+    app.add_middleware(
+        RequestLoggingMiddleware,
+        default_rate=settings.REQUEST_LOG_SAMPLE_RATE,
+        route_rates=settings.REQUEST_LOG_ROUTE_SAMPLE_RATES,
+        body_routes=settings.REQUEST_LOG_BODY_ROUTES,
+        body_max_bytes=settings.REQUEST_LOG_BODY_MAX_BYTES,
+        redact_headers=settings.REQUEST_LOG_REDACT_HEADERS
+    )
+
+# In-memory request counters, latency histograms and in-flight gauges
+app.add_middleware(InstrumentationMiddleware, metrics=request_metrics)
 
 # Include routers
 app.include_router(generation_router)
 app.include_router(deployments_router)
 app.include_router(agents_router)
 app.include_router(metrics_router)
-
-# Start Prometheus metrics exporter in a separate thread
-def start_metrics_exporter():
-    from app.config import settings
-    exporter = MongoDBExporter(
-        mongo_uri=settings.MONGODB_URL,
-        db_name=f"{settings.MONGODB_DB}_metrics",
-        port=8001
-    )
-    exporter.run()
-
-# Start the exporter in a separate thread
-threading.Thread(target=start_metrics_exporter, daemon=True).start()
-
-@app.on_event("startup")
-async def startup_event():
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
-    logger.info("Starting ParagonAI Agent Deployment Platform")
\ No newline at end of file
+app.include_router(terraform_router)
@@ -0,0 +1,117 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The application is imported the way uvicorn runs it, from the back-end directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "back-end"))
+
+from fakes import (  # noqa: E402
+    FakeDatabase, FakeDockerClient, FakeKubectl, FakeLLM, FakeSubprocess, FakeTerraform, Latency
+)
+from load import RESULTS_KEY  # noqa: E402
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark", "offline load benchmarks")
+    group.addoption("--run-benchmarks", action="store_true",
+                    help="run the load benchmarks and compare them with the baselines")
+    group.addoption("--update-baselines", action="store_true",
+                    help="run the load benchmarks and record the results as the new baselines")
+    group.addoption("--regression-tolerance", type=float, default=0.5,
+                    help="allowed fractional slowdown against the baseline (default 0.5)")
+    group.addoption("--regression-slack-ms", type=float, default=5.0,
+                    help="latency increase always tolerated on top of the fraction (default 5 ms)")
+    group.addoption("--bench-requests", type=int, default=200, help="requests per endpoint")
+    group.addoption("--bench-concurrency", type=int, default=20, help="concurrent users per endpoint")
+    group.addoption("--bench-min-seconds", type=float, default=1.0,
+                    help="keep sending requests for at least this long per endpoint")
+    group.addoption("--bench-repeat", type=int, default=3,
+                    help="runs per endpoint; the fastest one is reported (default 3)")
+    group.addoption("--llm-latency", type=float, default=0.05, help="seconds per LLM completion")
+    group.addoption("--kubectl-latency", type=float, default=0.02, help="seconds per kubectl call")
+    group.addoption("--docker-latency", type=float, default=0.05, help="seconds per Docker build or push")
+    group.addoption("--terraform-latency", type=float, default=0.05, help="seconds per Terraform command")
+    group.addoption("--mongo-latency", type=float, default=0.002, help="seconds per MongoDB operation")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: load benchmark, run only with --run-benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Timings depend on the machine, so a plain run keeps to the functional checks
+    if config.getoption("--run-benchmarks") or config.getoption("--update-baselines"):
+        return
+    skip = pytest.mark.skip(reason="load benchmark; pass --run-benchmarks to run it")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(RESULTS_KEY, [])
+    if results:
+        terminalreporter.section("load benchmarks")
+        for result in results:
+            terminalreporter.write_line(result.report())
+
+
+@pytest.fixture(scope="session")
+def bench_config(request) -> dict:
+    """Settings a baseline is only comparable under"""
+    option = request.config.getoption
+    return {
+        "requests": option("--bench-requests"),
+        "concurrency": option("--bench-concurrency"),
+        "min_seconds": option("--bench-min-seconds"),
+        "repeat": option("--bench-repeat"),
+        "llm_latency": option("--llm-latency"),
+        "kubectl_latency": option("--kubectl-latency"),
+        "docker_latency": option("--docker-latency"),
+        "terraform_latency": option("--terraform-latency"),
+        "mongo_latency": option("--mongo-latency")
+    }
+
+
+@pytest.fixture
+def fakes(request, monkeypatch, tmp_path, bench_config):
+    """Point every outside dependency of the app at an in-process fake"""
+    import app.services.kubernetes_service as kubernetes_module
+    import app.services.terraform_service as terraform_module
+    from app.admission import admission
+    from app.database import get_database
+    from app.services.deployment_service import deployment_service
+    from app.services.docker_service import docker_service
+    from app.services.llm_service import llm_service
+    from app.services.metrics_cache import chart_cache
+    from app.services.terraform_service import terraform_service
+    from main import app
+
+    llm = FakeLLM(Latency(bench_config["llm_latency"]))
+    kubectl = FakeKubectl(Latency(bench_config["kubectl_latency"]))
+    terraform = FakeTerraform(Latency(bench_config["terraform_latency"]))
+    docker = FakeDockerClient(Latency(bench_config["docker_latency"]))
+    database = FakeDatabase(Latency(bench_config["mongo_latency"]))
+
+    monkeypatch.setattr(llm_service, "_client", llm.client())
+    monkeypatch.setattr(kubernetes_module, "subprocess", FakeSubprocess(kubectl))
+    monkeypatch.setattr(terraform_module, "subprocess", FakeSubprocess(terraform))
+    monkeypatch.setattr(terraform_service, "module_cache_dir", tmp_path / "terraform-modules")
+    monkeypatch.setattr(docker_service, "_client", docker)
+    monkeypatch.setattr(docker_service, "_client_checked", True)
+    monkeypatch.setattr(deployment_service, "output_base_dir", tmp_path / "generations")
+    monkeypatch.setitem(app.dependency_overrides, get_database, lambda: database)
+    # The suite measures the request pipeline, not the per-client rate limits
+    monkeypatch.setattr(admission, "enabled", False)
+    # Each test starts with a cold chart cache
+    monkeypatch.setattr(chart_cache, "_buckets", type(chart_cache._buckets)())
+
+    return {
+        "app": app,
+        "llm": llm,
+        "kubectl": kubectl,
+        "terraform": terraform,
+        "docker": docker,
+        "database": database
+    }
@@ -0,0 +1,348 @@
+"""
+In-process stand-ins for everything the back end talks to.
+
+Each fake sleeps for a configurable latency per call, so a benchmark run
+measures the application's own overhead and concurrency behaviour on top of
+a predictable dependency cost, without network access or external binaries.
+"""
+import asyncio
+import io
+import json
+import random
+import subprocess
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+UNIT_DELTAS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+class Latency:
+    """Fixed delay with optional uniform jitter, in seconds"""
+
+    def __init__(self, seconds: float, jitter: float = 0.0):
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def sample(self) -> float:
+        return max(self.seconds + random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def sleep(self):
+        time.sleep(self.sample())
+
+    async def asleep(self):
+        await asyncio.sleep(self.sample())
+
+
+class FakeLLM:
+    """
+    OpenAI-compatible chat completions endpoint served through an httpx transport.
+
+    The real openai client is pointed at it, so request building and response
+    parsing still run. Every completion returns the same JSON requirements,
+    which parse_deployment_prompt accepts and the code generators pass through.
+    """
+
+    CONTENT = json.dumps({
+        "agent_type": "customer_support",
+        "cloud_provider": "aws",
+        "scale_requirements": {"replicas": 2, "auto_scale": False},
+        "monitoring_needs": True,
+        "security_requirements": {"enable_scan": True}
+    })
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.calls = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.latency.sleep()
+        body = json.loads(request.content)
+        return httpx.Response(200, json={
+            "id": f"chatcmpl-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.CONTENT},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 50, "total_tokens": 100}
+        })
+
+    def client(self):
+        from openai import OpenAI
+        return OpenAI(
+            api_key="fake",
+            base_url="http://fake-llm/v1",
+            http_client=httpx.Client(transport=httpx.MockTransport(self.handle)),
+            max_retries=0
+        )
+
+
+class FakeSubprocess:
+    """Replaces a service module's `subprocess` with one whose run and Popen call a fake CLI"""
+
+    PIPE = subprocess.PIPE
+    CompletedProcess = subprocess.CompletedProcess
+
+    def __init__(self, cli):
+        self.cli = cli
+
+    def run(self, cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+        return self.cli.run(cmd, **kwargs)
+
+    def Popen(self, cmd: List[str], **kwargs) -> "FakePopen":
+        return self.cli.popen(cmd, **kwargs)
+
+
+class FakeKubectl:
+    """kubectl answering every call successfully, with ready deployments and load balancer services"""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.calls: List[List[str]] = []
+
+    def run(self, cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+        self.calls.append(cmd)
+        self.latency.sleep()
+        stdout = ""
+        if cmd[1:3] == ["get", "deployment"]:
+            stdout = json.dumps({"status": {"replicas": 2, "readyReplicas": 2, "availableReplicas": 2}})
+        elif cmd[1:3] == ["get", "service"]:
+            stdout = json.dumps({
+                "spec": {"type": "LoadBalancer"},
+                "status": {"loadBalancer": {"ingress": [{"hostname": f"{cmd[3]}.fake-elb.example"}]}}
+            })
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr="")
+
+
+class FakePopen:
+    """Child process whose output is known up front and which exits after a delay"""
+
+    def __init__(self, cmd: List[str], stdout_lines: List[str], latency: Latency, returncode: int = 0):
+        self.args = cmd
+        self.pid = 0
+        self.stdout = io.StringIO("".join(line + "\n" for line in stdout_lines))
+        self.stderr = io.StringIO("")
+        self.returncode: Optional[int] = None
+        self._latency = latency
+        self._exit_code = returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if self.returncode is None:
+            self._latency.sleep()
+            self.returncode = self._exit_code
+        return self.returncode
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def send_signal(self, signal):
+        self.returncode = 130
+
+    def kill(self):
+        self.returncode = -9
+
+
+class FakeTerraform:
+    """terraform init, plan, apply, destroy and output against a workspace, without providers"""
+
+    OUTPUTS = {"cluster_endpoint": {"value": "https://fake-eks.example", "sensitive": False}}
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.calls: List[List[str]] = []
+
+    def run(self, cmd: List[str], cwd: Optional[str] = None, **kwargs) -> subprocess.CompletedProcess:
+        self.calls.append(cmd)
+        self.latency.sleep()
+        stdout = ""
+        if cmd[1] == "init" and cwd:
+            (Path(cwd) / ".terraform").mkdir(parents=True, exist_ok=True)
+        elif cmd[1] == "output":
+            stdout = json.dumps(self.OUTPUTS)
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr="")
+
+    def popen(self, cmd: List[str], cwd: Optional[str] = None, **kwargs) -> FakePopen:
+        self.calls.append(cmd)
+        for arg in cmd:
+            if arg.startswith("-out="):
+                Path(arg[len("-out="):]).write_bytes(b"fake plan")
+        lines = [
+            json.dumps({"@level": "info", "@message": f"{cmd[1]}: starting", "type": "version"}),
+            json.dumps({
+                "@level": "info",
+                "@message": "Plan: 0 to add, 0 to change, 0 to destroy.",
+                "type": "change_summary",
+                "changes": {"add": 0, "change": 0, "remove": 0, "operation": cmd[1]}
+            })
+        ]
+        return FakePopen(cmd, lines, self.latency)
+
+
+class FakeDockerAPI:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def build(self, fileobj=None, tag: str = "", **kwargs):
+        # The daemon reads the whole context before streaming build output
+        fileobj.read()
+        self.latency.sleep()
+        return iter([{"stream": f"Successfully tagged {tag}\n"}])
+
+
+class FakeImage:
+    def __init__(self, name: str):
+        self.id = "sha256:" + format(abs(hash(name)), "x").rjust(64, "0")
+
+    def tag(self, repository: str, tag: Optional[str] = None) -> bool:
+        return True
+
+
+class FakeImages:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def get(self, name: str) -> FakeImage:
+        return FakeImage(name)
+
+    def push(self, name: str, stream: bool = False, decode: bool = False):
+        self.latency.sleep()
+        return iter([{"status": "Pushed"}])
+
+
+class FakeDockerClient:
+    """The parts of docker.DockerClient the Docker service uses"""
+
+    def __init__(self, latency: Latency):
+        self.api = FakeDockerAPI(latency)
+        self.images = FakeImages(latency)
+
+    def login(self, username: str, password: str, registry: str):
+        return {"Status": "Login Succeeded"}
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict[str, Any]], latency: Latency):
+        self.documents = documents
+        self.latency = latency
+
+    def sort(self, key, direction: int = 1) -> "FakeCursor":
+        self.documents = sorted(self.documents, key=lambda doc: doc.get(key), reverse=direction < 0)
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        await self.latency.asleep()
+        return list(self.documents)
+
+
+class FakeResult:
+    def __init__(self, matched: int = 0, upserted_id: Any = None):
+        self.matched_count = matched
+        self.modified_count = matched
+        self.upserted_id = upserted_id
+        self.deleted_count = matched
+
+
+class FakeCollection:
+    """
+    Enough of an AsyncCollection for the back end: documents keyed by _id.
+
+    Aggregations answer the request count chart pipeline only, with a steady
+    synthetic request rate, since evaluating arbitrary pipelines is out of scope.
+    """
+
+    def __init__(self, latency: Latency, requests_per_bucket: int = 120):
+        self.latency = latency
+        self.requests_per_bucket = requests_per_bucket
+        self.documents: Dict[Any, Dict[str, Any]] = {}
+
+    async def create_index(self, *args, **kwargs) -> str:
+        await self.latency.asleep()
+        return "index"
+
+    async def insert_one(self, document: Dict[str, Any]) -> FakeResult:
+        await self.latency.asleep()
+        from pymongo.errors import DuplicateKeyError
+        key = document.setdefault("_id", len(self.documents))
+        if key in self.documents:
+            raise DuplicateKeyError(f"duplicate key {key}")
+        self.documents[key] = dict(document)
+        return FakeResult(upserted_id=key)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> FakeResult:
+        await self.latency.asleep()
+        for document in documents:
+            self.documents[document.setdefault("_id", len(self.documents))] = dict(document)
+        return FakeResult(len(documents))
+
+    async def find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        await self.latency.asleep()
+        return self.documents.get(query.get("_id"))
+
+    def find(self, query: Optional[Dict[str, Any]] = None) -> FakeCursor:
+        return FakeCursor(list(self.documents.values()), self.latency)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> FakeResult:
+        await self.latency.asleep()
+        key = query.get("_id")
+        document = self.documents.get(key)
+        if document is None:
+            if not upsert:
+                return FakeResult()
+            document = self.documents[key] = {"_id": key, **update.get("$setOnInsert", {})}
+            upserted = key
+        else:
+            upserted = None
+        document.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            document[field] = document.get(field, 0) + amount
+        return FakeResult(0 if upserted is not None else 1, upserted)
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any]) -> FakeResult:
+        await self.latency.asleep()
+        for document in self.documents.values():
+            document.update(update.get("$set", {}))
+        return FakeResult(len(self.documents))
+
+    async def delete_one(self, query: Dict[str, Any]) -> FakeResult:
+        await self.latency.asleep()
+        return FakeResult(1 if self.documents.pop(query.get("_id"), None) is not None else 0)
+
+    async def bulk_write(self, requests: list, ordered: bool = True) -> FakeResult:
+        await self.latency.asleep()
+        return FakeResult(len(requests))
+
+    async def aggregate(self, pipeline: List[Dict[str, Any]]) -> FakeCursor:
+        await self.latency.asleep()
+        densify = next((stage["$densify"] for stage in pipeline if "$densify" in stage), None)
+        if densify is None:
+            return FakeCursor([], self.latency)
+        start, end = densify["range"]["bounds"]
+        step = UNIT_DELTAS[densify["range"]["unit"]] * densify["range"]["step"]
+        rows = []
+        bucket = start
+        while bucket < end:
+            rows.append({"bucket": bucket, "count": self.requests_per_bucket, "errors": self.requests_per_bucket // 50})
+            bucket += step
+        return FakeCursor(rows, Latency(0))
+
+
+class FakeDatabase:
+    """AsyncDatabase stand-in handing out one FakeCollection per name"""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        collection = self.collections.get(name)
+        if collection is None:
+            collection = self.collections[name] = FakeCollection(self.latency)
+        return collection
@@ -0,0 +1,114 @@
+"""
+Closed-loop load driver and baseline comparison for the benchmark suite.
+"""
+import asyncio
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import pytest
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+# Results of this session, printed in the terminal summary
+RESULTS_KEY = pytest.StashKey[list]()
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of unsorted samples"""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class LoadResult:
+    def __init__(self, endpoint: str, latencies: List[float], elapsed: float, errors: int):
+        self.endpoint = endpoint
+        self.requests = len(latencies)
+        self.errors = errors
+        self.throughput = self.requests / elapsed
+        self.p50 = percentile(latencies, 0.50) * 1000
+        self.p95 = percentile(latencies, 0.95) * 1000
+        self.p99 = percentile(latencies, 0.99) * 1000
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "throughput": round(self.throughput, 2),
+            "p50_ms": round(self.p50, 2),
+            "p95_ms": round(self.p95, 2),
+            "p99_ms": round(self.p99, 2)
+        }
+
+    def report(self) -> str:
+        return (
+            f"{self.endpoint:<26} {self.requests:>6} req {self.errors:>4} err "
+            f"{self.throughput:>9.1f} req/s  p50 {self.p50:>8.1f} ms  "
+            f"p95 {self.p95:>8.1f} ms  p99 {self.p99:>8.1f} ms"
+        )
+
+
+async def run_load(client: httpx.AsyncClient, endpoint: str, request: Callable[[httpx.AsyncClient, int], Any],
+                   requests: int, concurrency: int, min_seconds: float) -> LoadResult:
+    """
+    Send at least `requests` requests, and keep going for at least
+    `min_seconds`, from `concurrency` users that each start their next request
+    as soon as the previous one is answered. One unmeasured request per user
+    goes first, so thread pools, clients and caches are warm.
+    """
+    await asyncio.gather(*[request(client, index) for index in range(concurrency)])
+
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+
+    async def user():
+        nonlocal issued, errors
+        while issued < requests or time.perf_counter() - began < min_seconds:
+            index = issued
+            issued += 1
+            sent = time.perf_counter()
+            response = await request(client, index)
+            latencies.append(time.perf_counter() - sent)
+            if response.status_code >= 400:
+                errors += 1
+
+    began = time.perf_counter()
+    await asyncio.gather(*[user() for _ in range(concurrency)])
+    return LoadResult(endpoint, latencies, time.perf_counter() - began, errors)
+
+
+def load_baselines() -> Dict[str, Any]:
+    if not BASELINES_FILE.exists():
+        return {}
+    return json.loads(BASELINES_FILE.read_text())
+
+
+def save_baseline(endpoint: str, result: LoadResult, config: Dict[str, Any]):
+    baselines = load_baselines()
+    baselines[endpoint] = {"config": config, **result.to_dict()}
+    BASELINES_FILE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def regressions(result: LoadResult, baseline: Dict[str, Any], tolerance: float, slack_ms: float) -> List[str]:
+    """
+    Ways the result is worse than the baseline by more than the tolerance.
+
+    Latencies also get an absolute slack, since sub-millisecond timings move
+    by multiples from scheduler noise alone.
+    """
+    problems = []
+    if result.throughput < baseline["throughput"] * (1 - tolerance):
+        problems.append(f"throughput {result.throughput:.1f} req/s < baseline {baseline['throughput']} req/s")
+    for name, value in (("p50_ms", result.p50), ("p95_ms", result.p95)):
+        if value > baseline[name] * (1 + tolerance) + slack_ms:
+            problems.append(f"{name} {value:.1f} > baseline {baseline[name]}")
+    return problems
+
+
+def baseline_for(endpoint: str, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The stored baseline, if it was recorded with the same load and latency settings"""
+    baseline = load_baselines().get(endpoint)
+    if baseline is None or baseline.get("config") != config:
+        return None
+    return baseline
@@ -0,0 +1,36 @@
+"""
+The Docker and Terraform paths run fully offline against the fakes.
+"""
+
+
+def test_docker_build_and_push(fakes, tmp_path):
+    from app.services.docker_service import docker_service
+
+    (tmp_path / "Dockerfile").write_text("FROM python:3.11-slim\nCOPY main.py .\nCMD [\"python\", \"main.py\"]\n")
+    (tmp_path / "main.py").write_text("print('agent')\n")
+    (tmp_path / "notes.txt").write_text("not copied\n")
+
+    assert docker_service.build_image(str(tmp_path), "bench-agent")
+    report = docker_service.build_reports["bench-agent:latest"]
+    assert report["success"]
+    # Only the Dockerfile and the file it copies are sent to the daemon
+    assert report["context_files"] == 2
+    assert docker_service.push_image("bench-agent", registry="registry.example")
+
+
+def test_terraform_plan_then_apply(fakes, tmp_path):
+    from app.services.terraform_service import terraform_service
+
+    (tmp_path / "main.tf").write_text('output "cluster_endpoint" { value = "x" }\n')
+
+    plan = terraform_service.wait(terraform_service.submit("plan", str(tmp_path)), timeout=10)
+    assert plan["status"] == "succeeded"
+    assert plan["result"]["changes"]["add"] == 0
+    assert plan["result"]["saved_plan"]
+
+    apply = terraform_service.wait(terraform_service.submit("apply", str(tmp_path)), timeout=10)
+    assert apply["status"] == "succeeded"
+    assert terraform_service.output(str(tmp_path), "cluster_endpoint") == "https://fake-eks.example"
+
+    verbs = [call[1] for call in fakes["terraform"].calls]
+    assert verbs == ["init", "plan", "apply", "output"]
@@ -0,0 +1,125 @@
+"""
+Offline load benchmarks for the main API endpoints.
+
+The benchmarks only run with --run-benchmarks, since their timings depend on
+the machine; a plain run keeps the functional check at the bottom. Every
+outside dependency is an in-process fake with injected latency (see
+fakes.py), so the numbers reflect the application's own overhead and its
+concurrency limits. Results are compared with tests/baselines.json, recorded
+under the same load and latency settings, and a test fails when throughput
+drops or p50/p95 latency grows by more than the tolerance.
+
+Generation is benchmarked at /generate/: the /generation router in
+app/routers/generation.py is shadowed by the one defined after it and is
+not mounted.
+
+    python -m pytest tests                        # functional checks only
+    python -m pytest tests --run-benchmarks       # compare with the baselines
+    python -m pytest tests --update-baselines     # record new baselines
+    python -m pytest tests --run-benchmarks --llm-latency 0.5 --bench-concurrency 50
+"""
+import asyncio
+import warnings
+
+import httpx
+import pytest
+
+from load import RESULTS_KEY, baseline_for, regressions, run_load, save_baseline
+
+GENERATE_BODY = {"prompt": "Deploy a customer support agent with monitoring", "cloud_provider": "aws"}
+TIME_RANGES = [("1h", "5m"), ("24h", "1h"), ("7d", "6h")]
+
+
+async def post_generate(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.post("/generate/", json=GENERATE_BODY)
+
+
+async def get_templates(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.get("/agents/templates")
+
+
+async def get_request_counts(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    time_range, interval = TIME_RANGES[index % len(TIME_RANGES)]
+    return await client.get("/metrics/requests/count", params={"time_range": time_range, "interval": interval})
+
+
+def post_deployment(generation_id: str):
+    async def request(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post("/deployments/", json={
+            "generation_id": generation_id,
+            "cloud_provider": "aws",
+            "namespace": f"bench-{index % 4}",
+            "replicas": 2
+        })
+    return request
+
+
+async def benchmark(app, endpoint: str, bench_config: dict):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        if endpoint == "/deployments/":
+            generated = await client.post("/generate/", json=GENERATE_BODY)
+            generated.raise_for_status()
+            request = post_deployment(generated.json()["generation_id"])
+        else:
+            request = REQUESTS[endpoint]
+        # Best of several runs, as with timeit: noise only ever makes a run slower
+        runs = [
+            await run_load(
+                client, endpoint, request,
+                bench_config["requests"], bench_config["concurrency"], bench_config["min_seconds"]
+            )
+            for _ in range(bench_config["repeat"])
+        ]
+        return max(runs, key=lambda result: result.throughput)
+
+
+REQUESTS = {
+    "/generate/": post_generate,
+    "/agents/templates": get_templates,
+    "/metrics/requests/count": get_request_counts,
+}
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("endpoint", ["/generate/", "/deployments/", "/agents/templates", "/metrics/requests/count"])
+def test_endpoint_load(endpoint, fakes, bench_config, request):
+    result = asyncio.run(benchmark(fakes["app"], endpoint, bench_config))
+    request.config.stash.setdefault(RESULTS_KEY, []).append(result)
+
+    assert result.errors == 0, f"{result.errors} of {result.requests} requests to {endpoint} failed"
+
+    if request.config.getoption("--update-baselines"):
+        save_baseline(endpoint, result, bench_config)
+        return
+    baseline = baseline_for(endpoint, bench_config)
+    if baseline is None:
+        warnings.warn(f"No baseline for {endpoint} under these settings; run with --update-baselines")
+        return
+    problems = regressions(
+        result, baseline,
+        request.config.getoption("--regression-tolerance"),
+        request.config.getoption("--regression-slack-ms")
+    )
+    assert not problems, f"{endpoint} regressed: " + "; ".join(problems)
+
+
+async def generate_then_deploy(app) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        generated = await client.post("/generate/", json=GENERATE_BODY)
+        generated.raise_for_status()
+        return await post_deployment(generated.json()["generation_id"])(client, 0)
+
+
+def test_requests_only_reach_fakes(fakes):
+    """One generation calls the LLM twice; its deployment creates, applies both manifests and reads back, timing each stage"""
+    response = asyncio.run(generate_then_deploy(fakes["app"]))
+    assert response.status_code == 200
+    assert response.json()["endpoint"] == "customer_support-agent-service.fake-elb.example"
+    # Requirements parsing and agent code generation
+    assert fakes["llm"].calls == 2
+    verbs = [call[1] for call in fakes["kubectl"].calls]
+    assert verbs == ["create", "apply", "apply", "get", "get"]
+    stages = [timing.split(";")[0] for timing in response.headers["server-timing"].split(", ")]
+    assert stages == ["namespace", "apply", "status", "total"]
@@ -0,0 +1,28 @@
+"""
+Rendering of the generated package's manifests, Dockerfiles and Terraform.
+
+The templates are YAML, HCL and shell, so nothing may be HTML-escaped.
+"""
+from app.services.template_service import template_service
+
+K8S_CONTEXT = {
+    "app_name": "support-agent",
+    "namespace": "default",
+    "version": "v1",
+    "replicas": 2,
+    "image": "<registry>/support-agent:latest",
+    "port": 8000,
+    "env_vars": {"GREETING": "Hello & welcome"},
+    "memory_request": "256Mi",
+    "cpu_request": "100m",
+    "memory_limit": "512Mi",
+    "cpu_limit": "500m",
+    "service_type": "LoadBalancer"
+}
+
+
+def test_manifest_placeholders_are_not_escaped():
+    deployment = template_service.render_kubernetes_deployment(K8S_CONTEXT)
+    assert "<registry>/support-agent:latest" in deployment
+    assert "Hello & welcome" in deployment
+    assert "&lt;" not in deployment and "&amp;" not in deployment